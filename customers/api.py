@@ -1,4 +1,4 @@
-from .models import Customer, Prescription
+from .models import Customer, Prescription, phone_query
 from django.db.models import Q
 from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
@@ -26,8 +26,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         queryset = Customer.objects.filter(organization=organization) if organization else Customer.objects.none()
 
         if phone:
-            print(phone)
-            queryset = queryset.filter(phone__icontains=phone)  # Add the phone filter if phone is present in the URL parameters
+            queryset = queryset.filter(phone_query(phone))  # Add the phone filter if phone is present in the URL parameters
 
         return queryset
 
@@ -73,7 +72,7 @@ class CustomerSearchView(APIView):
 
         query = Q(organization=organization)
         if phone:
-            query &= Q(phone__icontains=phone)
+            query &= phone_query(phone)
         if email:
             query &= Q(email__icontains=email)
 
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0008_alter_customer_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['organization', 'updated_on', 'id'], name='customer_org_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['organization', 'updated_on', 'id'], name='prescription_org_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 09:04
+
+import re
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def backfill_phone_digits(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('id', 'phone').iterator(chunk_size=2000):
+        customer.phone_digits = re.sub(r'\D', '', customer.phone or '')
+        batch.append(customer)
+        if len(batch) == 2000:
+            Customer.objects.bulk_update(batch, ['phone_digits'])
+            batch = []
+    Customer.objects.bulk_update(batch, ['phone_digits'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0009_organization_updated_on_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_phone_digits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['organization', 'phone_digits'], name='customer_org_phone_digits_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone_digits'], name='customer_phone_digits_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
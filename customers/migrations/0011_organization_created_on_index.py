@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0010_customer_phone_digits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['organization', 'created_on'], name='customer_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['organization', 'created_on'], name='prescription_org_created_idx'),
+        ),
+    ]
@@ -1,7 +1,29 @@
+import re
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import Q
 from organizations.models import Organization
 from django.contrib.auth.models import User
 
+def normalize_phone(phone):
+    """ Digits of a phone number, so "+971 50-123" and "97150123" match. """
+    return re.sub(r'\D', '', phone or '')
+
+
+def phone_query(phone, prefix=''):
+    """
+    Q for customers whose phone contains `phone`, on the indexed phone_digits column.
+    Fewer than three digits is too short for the trigram index, so those match from the start.
+    `prefix` is the path to the customer, e.g. 'customer__'.
+    """
+    digits = normalize_phone(phone)
+    if not digits:
+        return Q(**{f'{prefix}phone__icontains': phone})
+    if len(digits) < 3:
+        return Q(**{f'{prefix}phone_digits__startswith': digits})
+    return Q(**{f'{prefix}phone_digits__contains': digits})
+
+
 # Utility function to generate choices for FloatFields
 
 
@@ -19,6 +41,20 @@ class Customer(models.Model):
             models.UniqueConstraint(
                 fields=['email', 'organization'], name='unique_email_per_org')
         ]
+        indexes = [
+            # Delta sync walks an organization's changes in (updated_on, id) order
+            models.Index(
+                fields=['organization', 'updated_on', 'id'], name='customer_org_updated_idx'),
+            # Daily metrics aggregate an organization's customers by created_on day
+            models.Index(
+                fields=['organization', 'created_on'], name='customer_org_created_idx'),
+            # Phone lookups: prefix matches on the B-tree, contains matches on the trigram index
+            models.Index(
+                fields=['organization', 'phone_digits'], opclasses=['int8_ops', 'varchar_pattern_ops'],
+                name='customer_org_phone_digits_idx'),
+            GinIndex(
+                fields=['phone_digits'], opclasses=['gin_trgm_ops'], name='customer_phone_digits_trgm'),
+        ]
     GENDER_CHOICES = (
         ('M', 'Male'),
         ('F', 'Female'),
@@ -26,6 +62,8 @@ class Customer(models.Model):
         ('N', 'Prefer not to say'),
     )
     phone = models.CharField(max_length=20)
+    # Digits of phone, kept in sync on save; see phone_query
+    phone_digits = models.CharField(max_length=20, blank=True, default='', editable=False)
     email = models.EmailField(null=True, blank=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -53,6 +91,13 @@ class Customer(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.phone} {self.email}"
 
+    def save(self, *args, **kwargs):
+        self.phone_digits = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_digits'}
+        super().save(*args, **kwargs)
+
 
 class Prescription(models.Model):
     customer = models.ForeignKey(
@@ -102,5 +147,15 @@ class Prescription(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Delta sync walks an organization's changes in (updated_on, id) order
+            models.Index(
+                fields=['organization', 'updated_on', 'id'], name='prescription_org_updated_idx'),
+            # Daily metrics aggregate an organization's prescriptions by created_on day
+            models.Index(
+                fields=['organization', 'created_on'], name='prescription_org_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.customer.first_name} on {self.created_on}: {self.id}"
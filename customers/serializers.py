@@ -26,7 +26,7 @@ class CustomerGetSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Customer
-        exclude = ('organization',)
+        exclude = ('organization', 'phone_digits')
         read_only_fields = ('organization',)
 
 
@@ -35,7 +35,7 @@ class CustomerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Customer
-        exclude = ('organization',)
+        exclude = ('organization', 'phone_digits')
         read_only_fields = ('organization',)
 
     def validate(self, data):
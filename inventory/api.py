@@ -3,7 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from optic_invoicer_api.custom_cursor_pagination import CustomCursorPagination
-from organizations.utils import check_create_invoice_permission
+from organizations.entitlements import get_invoice_entitlement
 from .models import Inventory, InventoryCSV
 from .tasks import download_and_process_file
 from .serializers import InventorySerializer, BulkInventorySerializer, InventoryCSVSerializer
@@ -24,10 +24,15 @@ class InventoryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         user = self.request.user
         organization = self.request.get_organization()
-        latest_subscription, create_invoice_permission = check_create_invoice_permission(organization)
-        if not create_invoice_permission:
+        entitlement = get_invoice_entitlement(organization.id)
+        if not entitlement.can_create:
+            if entitlement.subscription_type is None:
+                raise PermissionDenied({
+                    "error": "Your organization has no active subscription. "
+                             "Please contact the administrator to add more Inventory."
+                })
             raise PermissionDenied({
-                "error": f"Your {latest_subscription.subscription_type} subscription has ended. "
+                "error": f"Your {entitlement.subscription_type} subscription has ended. "
                          f"Please contact the administrator to add more Inventory."
             })
         serializer.save(organization=organization, created_by=user)
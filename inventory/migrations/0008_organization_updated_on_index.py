@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_alter_inventorycsv_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['organization', 'updated_on', 'id'], name='inventory_org_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_organization_updated_on_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['organization', 'created_on'], name='inventory_org_created_idx'),
+        ),
+    ]
@@ -37,6 +37,14 @@ class Inventory(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, related_name="inventories")
 
+    class Meta:
+        indexes = [
+            # Delta sync walks an organization's changes in (updated_on, id) order
+            models.Index(fields=['organization', 'updated_on', 'id'], name='inventory_org_updated_idx'),
+            # Daily metrics aggregate an organization's inventory by created_on day
+            models.Index(fields=['organization', 'created_on'], name='inventory_org_created_idx'),
+        ]
+
     def generate_sku(self):
         prefix = self.organization.name[:4].upper()
         existing_skus = Inventory.objects.filter(SKU__startswith=prefix).count()
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from django.db import transaction
 from .models import Inventory, InventoryCSV
+from organizations.metrics import schedule_daily_metrics_refresh
 
 import logging
 
@@ -55,7 +57,12 @@ class BulkInventorySerializer(serializers.Serializer):
             inventory.SKU = inventory.generate_sku()
             # Append the Inventory object to the list
             inventories_objects.append(inventory)
-        return Inventory.objects.bulk_create(inventories_objects)
+        with transaction.atomic():
+            inventories = Inventory.objects.bulk_create(inventories_objects)
+            # bulk_create sends no post_save, so the day's rollup is refreshed here
+            for inventory in inventories:
+                schedule_daily_metrics_refresh(inventory.organization_id, inventory.created_on, "inventory")
+        return inventories
 
     def to_representation(self, obj):
         # obj here should be a list of Inventory instances
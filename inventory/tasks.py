@@ -5,11 +5,16 @@ from io import StringIO
 import csv
 import requests
 from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
 
 @shared_task
 def download_and_process_file(file_id, organization):
     InventoryCSV = apps.get_model('inventory', 'InventoryCSV')
     Inventory = apps.get_model('inventory', 'Inventory')
+    # Imported here: organizations.metrics imports inventory.models, which imports this module
+    from organizations.metrics import schedule_daily_metrics_refresh
+    updated_days = set()
 
     try:
         inventory_csv = InventoryCSV.objects.get(id=file_id)
@@ -31,7 +36,10 @@ def download_and_process_file(file_id, organization):
 
             inventory_item, created = Inventory.objects.get_or_create(store_sku=store_sku, defaults=row)
             if not created and update_flag:
-                Inventory.objects.filter(store_sku=store_sku).update(**row)
+                updated_items = Inventory.objects.filter(store_sku=store_sku)
+                updated_days.update(updated_items.values_list('organization_id', 'created_on'))
+                # update() skips auto_now, and delta sync picks changes up by updated_on
+                updated_items.update(**row, updated_on=timezone.now())
 
         inventory_csv.status = 'Completed'
         inventory_csv.save()
@@ -46,6 +54,11 @@ def download_and_process_file(file_id, organization):
         inventory_csv.status = 'Error'
         inventory_csv.remarks = str(e)
         inventory_csv.save()
+    finally:
+        # update() sends no post_save, so the updated items' days are refreshed here, once per day
+        with transaction.atomic():
+            for organization_id, created_on in updated_days:
+                schedule_daily_metrics_refresh(organization_id, created_on, "inventory")
 
 # Replace print statements with logging for better output management
 logging.basicConfig(level=logging.INFO)
@@ -1,15 +1,34 @@
+from uuid import uuid4
 from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
+from rest_framework.request import Request
+from rest_framework.exceptions import APIException, NotAuthenticated
+from knox.auth import TokenAuthentication
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.views import View
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse, JsonResponse, Http404
+from django.core.files.storage import default_storage
 from django.core.exceptions import PermissionDenied
-from .models import Invoice, InvoicePayment, InvoiceItem
-from .serializers import InvoiceCreateSerializer, InvoiceGetSerializer, InvoicePaymentSerializer, InvoiceGetItemSerializer, InvoiceUpdateSerializer
+from .models import Invoice, InvoicePayment
+from .serializers import InvoiceCreateSerializer, InvoiceGetSerializer, InvoicePaymentSerializer, InvoiceGetItemSerializer, InvoiceUpdateSerializer, InvoiceBulkStatusSerializer
 from rest_framework.response import Response
-from organizations.utils import check_create_invoice_permission
-from .create_invoice import create_invoice_pdf, create_invoice_pdf_customer
-
-
-class InvoiceViewSet(viewsets.ModelViewSet):
+from organizations.entitlements import get_invoice_entitlement
+from customers.models import phone_query
+from optic_invoicer_api.query_plan import QueryPlanMixin
+from optic_invoicer_api.idempotency import idempotent
+from .create_invoice import render_invoice_batch_pdf, pdf_response
+from .pdf_render_service import invoice_pdf_response
+from .filters import filter_invoices, get_print_run_invoices
+from .bulk_status import transition_invoice_status
+from .invoice_render_model import invoice_render_queryset, to_render_model
+from .tasks import render_invoice_batch
+from .export_invoices import stream_lines, ndjson_lines, csv_lines
+
+
+class InvoiceViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'list':
             return InvoiceGetSerializer
@@ -42,7 +61,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             # Filter by phone number if provided
             phone = self.request.GET.get('phone', None)
             if phone:
-                queryset = queryset.filter(customer__phone__icontains=phone)
+                queryset = queryset.filter(phone_query(phone, prefix='customer__'))
             return queryset
         return Invoice.objects.none()  # Return an empty queryset if conditions aren't met
     # Return an empty queryset if conditions aren't met
@@ -50,26 +69,32 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         instance.is_active = False
-        instance.save()
+        instance.save(update_fields=['is_active', 'updated_on'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class GetInvoice(APIView):
+    """
+    Streams every invoice of the organization with its items and payments,
+    as NDJSON (default) or CSV (?export_format=csv), optionally limited by
+    ?start_date= and ?end_date= (YYYY-MM-DD, on the invoice date).
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         invoices = Invoice.objects.filter(organization=request.get_organization())
-        new_invoices = []
-        for invoice in invoices:
-            inventory_items = InvoiceItem.objects.filter(invoice=invoice.id)
-            new_invoice = invoice.__dict__
-            for item in inventory_items:
-                item = item.__dict__
-                print(item)
-            new_invoice["items"] = inventory_items
-            new_invoices.append(new_invoice)
-
-        return Response({"items": []}, status=status.HTTP_200_OK)
+        invoices = filter_invoices(invoices, {
+            'start_date': request.query_params.get('start_date'),
+            'end_date': request.query_params.get('end_date'),
+        })
+
+        if request.query_params.get('export_format') == 'csv':
+            response = StreamingHttpResponse(stream_lines(csv_lines(invoices)), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename=invoices.csv'
+        else:
+            response = StreamingHttpResponse(stream_lines(ndjson_lines(invoices)), content_type='application/x-ndjson')
+            response['Content-Disposition'] = 'attachment; filename=invoices.ndjson'
+        return response
 
 
 class CreateInvoiceView(APIView):
@@ -89,21 +114,25 @@ class CreateInvoiceView(APIView):
                 invoice = Invoice.objects.get(invoice_number=invoice_number)
             else:
                 invoice = Invoice.objects.get(id=invoice_id)
-            invoice.save()
+            # Only touch updated_on: a full save would write back a paid total read before a concurrent payment
+            invoice.save(update_fields=['updated_on'])
             return Response(status=status.HTTP_202_ACCEPTED)
         except Invoice.DoesNotExist:
             raise Response({"error": "Invoice does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
+    @idempotent
     def post(self, request):
         # Prepare data for serialization
         data = request.data
         organization = request.get_organization()
         data['organization'] = organization
 
-        latest_subscription, create_invoice_permission = check_create_invoice_permission(organization)
+        entitlement = get_invoice_entitlement(organization.id)
 
-        if not create_invoice_permission:
-            return Response({"error": f"Your {latest_subscription.subscription_type} has ended please contact administrator to add more Invoices"}, status=status.HTTP_400_BAD_REQUEST)
+        if not entitlement.can_create:
+            if entitlement.subscription_type is None:
+                return Response({"error": "Your organization has no active subscription please contact administrator to add more Invoices"}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error": f"Your {entitlement.subscription_type} has ended please contact administrator to add more Invoices"}, status=status.HTTP_400_BAD_REQUEST)
         # Serialize and validate data
         serializer = InvoiceCreateSerializer(data=data, context={'request': request})
         # Check validation status
@@ -121,48 +150,135 @@ class CreateInvoiceView(APIView):
         if not invoice_id:
             return Response({'error': 'Invoice ID is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            invoice_instance = Invoice.objects.get(id=invoice_id)
-        except Invoice.DoesNotExist:
-            return Response({'error': 'Invoice instance not found'}, status=status.HTTP_404_NOT_FOUND)
+        # The update writes the whole invoice back, so it is locked until then: payments posted
+        # meanwhile wait instead of having their paid total and balance overwritten
+        with transaction.atomic():
+            try:
+                invoice_instance = Invoice.objects.select_for_update().get(id=invoice_id)
+            except Invoice.DoesNotExist:
+                return Response({'error': 'Invoice instance not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        invoice_serializer = InvoiceUpdateSerializer(invoice_instance, data=request.data, context={'request': request}, partial=True)
+            invoice_serializer = InvoiceUpdateSerializer(invoice_instance, data=request.data, context={'request': request}, partial=True)
 
-        if not invoice_serializer.is_valid():
-            return Response(invoice_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            if not invoice_serializer.is_valid():
+                return Response(invoice_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        invoice_serializer.save()
+            invoice_serializer.save()
         return Response(invoice_serializer.data, status=status.HTTP_200_OK)
 
 
-class InvoicePDFView(APIView):
-    serializer_class = InvoiceGetSerializer
+class InvoiceBulkStatusView(APIView):
+    """
+    Move many invoices to Delivered or Scrapped in one request, picked by `ids` or by a
+    `filter` of start_date / end_date / delivery_date / status. Invoices whose current
+    status does not allow the move are reported back and left as they are.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, invoice_id):
-        invoice = get_object_or_404(Invoice, id=invoice_id)
+    def post(self, request):
+        serializer = InvoiceBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated, results = transition_invoice_status(
+            request.get_organization(),
+            request.user,
+            serializer.validated_data['status'],
+            invoice_ids=serializer.validated_data.get('ids'),
+            params=serializer.validated_data.get('filter'),
+        )
+        return Response({"updated": updated, "results": results}, status=status.HTTP_200_OK)
+
+
+class InvoicePDFView(View):
+    """
+    Organization copy of an invoice. The invoice is authorized and loaded in a worker
+    thread and rendered by the PDF render service, so PDF bursts do not tie up the
+    threads serving the rest of the API.
+    """
+    copy_type = "organization_copy"
+
+    def get_invoice(self, request, invoice_id):
+        request = Request(request, authenticators=[TokenAuthentication()])
+        if not request.user.is_authenticated:
+            raise NotAuthenticated
+        organization = request.get_organization()
+        # Users without a staff profile have no organization and see no invoices
+        if organization is None:
+            raise PermissionDenied
+        invoice = get_object_or_404(invoice_render_queryset(Invoice.objects.all()), id=invoice_id)
         # Check if the user's organization matches the invoice's organization
-        if invoice.organization != request.get_organization():
+        if invoice.organization_id != organization.id:
             raise PermissionDenied
-        setattr(invoice, "organization", request.get_organization())
-        response = create_invoice_pdf("organization_copy", invoice)
+        return to_render_model(invoice)
 
-        return response
+    def get_filename(self, invoice):
+        return self.copy_type
+
+    async def get(self, request, invoice_id):
+        try:
+            invoice = await sync_to_async(self.get_invoice)(request, invoice_id)
+        except APIException as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+        except Http404:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except PermissionDenied:
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return await invoice_pdf_response(self.copy_type, invoice, self.get_filename(invoice))
+
+
+class InvoiceCustomerPDFView(InvoicePDFView):
+    copy_type = "customer_copy"
+
+    def get_filename(self, invoice):
+        return f"{self.copy_type}_{invoice.invoice_number}"
 
 
-class InvoiceCustomerPDFView(APIView):
-    serializer_class = InvoiceGetSerializer
+class InvoiceBatchPDFView(APIView):
+    """
+    Print run: all active invoices matching start_date / end_date / delivery_date / status
+    rendered into one multi-page PDF. GET renders it in the request, POST queues the
+    same job in the background (or runs it in the request when no Celery broker is
+    configured) and returns where the file will be stored.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, invoice_id):
-        invoice = get_object_or_404(Invoice, id=invoice_id)
-        # Check if the user's organization matches the invoice's organization
-        if invoice.organization != request.get_organization():
+    def get_organization(self, request):
+        organization = request.get_organization()
+        if organization is None:
             raise PermissionDenied
-        setattr(invoice, "organization", request.get_organization())
-        response = create_invoice_pdf_customer("customer_copy", invoice)
+        return organization
 
-        return response
+    def get(self, request):
+        invoices = [to_render_model(invoice) for invoice in get_print_run_invoices(self.get_organization(request).id, request.query_params)]
+        if not invoices:
+            return Response({"error": "No invoices match the given filters."}, status=status.HTTP_404_NOT_FOUND)
+        return pdf_response("invoices_print_run", render_invoice_batch_pdf(invoices))
+
+    def post(self, request):
+        organization = self.get_organization(request)
+        params = {
+            name: request.data.get(name)
+            for name in ('start_date', 'end_date', 'delivery_date', 'status')
+            if request.data.get(name)
+        }
+        # Validate the filters before queueing the job
+        get_print_run_invoices(organization.id, params)
+
+        file_name = f"invoice_print_runs/{organization.id}/{uuid4()}.pdf"
+        if not getattr(settings, 'CELERY_BROKER_URL', None):
+            # No queue to hand the job to, so the print run is rendered and stored right away
+            file_name = render_invoice_batch(organization.id, params, file_name)
+            return Response({
+                "task_id": None,
+                "file_name": file_name,
+                "url": default_storage.url(file_name)
+            }, status=status.HTTP_201_CREATED)
+
+        task = render_invoice_batch.delay(organization.id, params, file_name)
+        return Response({
+            "task_id": task.id,
+            "file_name": file_name,
+            "url": default_storage.url(file_name)
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class InvoicePaymentViewSet(viewsets.ModelViewSet):
@@ -186,6 +302,10 @@ class InvoicePaymentViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # Set the organization and created_by when creating a new InvoicePayment
         serializer.save(
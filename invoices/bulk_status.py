@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Invoice
+from .filters import filter_invoices
+from .pdf_cache import invoice_pdf_cache
+from .events import publish_invoices_status_changed
+
+# Target status -> statuses an invoice may be moved from in bulk. Paid is left to payments.
+STATUS_TRANSITIONS = {
+    "Delivered": ("Created", "Advanced", "Paid"),
+    "Scrapped": ("Created", "Advanced"),
+}
+BULK_STATUS_MAX_INVOICES = 500
+
+
+def transition_invoice_status(organization, user, target_status, invoice_ids=None, params=None):
+    """
+    Move the organization's active invoices, picked by id or by the filter_invoices params,
+    to `target_status` with a single UPDATE guarded by the allowed source statuses.
+    Returns (updated count, per invoice results).
+    """
+    allowed_statuses = STATUS_TRANSITIONS[target_status]
+    queryset = Invoice.objects.filter(organization=organization, is_active=True)
+    if invoice_ids is not None:
+        queryset = queryset.filter(id__in=invoice_ids)
+    else:
+        if not any(params.get(name) for name in ('start_date', 'end_date', 'delivery_date', 'status')):
+            raise ValueError("Provide start_date, end_date, delivery_date or status to select invoices.")
+        queryset = filter_invoices(queryset, params)
+
+    with transaction.atomic():
+        # Lock the selected rows so the reported results match what the UPDATE did
+        current_statuses = dict(
+            queryset.select_for_update().order_by('id').values_list('id', 'status')[:BULK_STATUS_MAX_INVOICES + 1]
+        )
+        if len(current_statuses) > BULK_STATUS_MAX_INVOICES:
+            raise ValueError(f"At most {BULK_STATUS_MAX_INVOICES} invoices can be updated at once, narrow the selection.")
+
+        movable_ids = [
+            invoice_id for invoice_id, current_status in current_statuses.items() if current_status in allowed_statuses
+        ]
+        updated = 0
+        if movable_ids:
+            updated = Invoice.objects.filter(id__in=movable_ids, status__in=allowed_statuses).update(
+                status=target_status, updated_by=user, updated_on=timezone.now()
+            )
+            transaction.on_commit(lambda: [invoice_pdf_cache.invalidate(invoice_id) for invoice_id in movable_ids])
+            publish_invoices_status_changed(organization.id, movable_ids, target_status)
+
+    results = []
+    for invoice_id in invoice_ids if invoice_ids is not None else current_statuses:
+        current_status = current_statuses.get(invoice_id)
+        if current_status is None:
+            result = "not_found"
+        elif current_status == target_status:
+            result = "unchanged"
+        elif current_status in allowed_statuses:
+            result = "updated"
+            current_status = target_status
+        else:
+            result = "invalid_transition"
+        results.append({"id": invoice_id, "result": result, "status": current_status})
+    return updated, results
@@ -1,16 +1,45 @@
-import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from knox.auth import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from .events import organization_group
+
+
+class InvoicesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live invoice events for one organization: invoice.created, invoice.updated and
+    payment.posted. Browsers cannot set headers on a websocket, so the knox token is
+    passed as ?token=...; a logged in session works as well.
+    """
+    group_name = None
 
-class InvoicesConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        await self.channel_layer.group_add("invoices", self.channel_name)
+        organization_id = await self.get_organization_id()
+        if organization_id is None:
+            await self.close(code=4401)
+            return
+        self.group_name = organization_group(organization_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("invoices", self.channel_name)
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    async def new_lead(self, event):
-        await self.send(text_data=json.dumps(event))
+    async def invoice_event(self, event):
+        await self.send_json({"event": event["event"], "data": event["data"]})
 
-    async def deleted_lead(self, event):
-        await self.send(text_data=json.dumps(event))
+    @database_sync_to_async
+    def get_organization_id(self):
+        user = self.scope.get("user")
+        token = parse_qs(self.scope.get("query_string", b"").decode()).get("token")
+        if token:
+            try:
+                user, _ = TokenAuthentication().authenticate_credentials(token[0].encode())
+            except AuthenticationFailed:
+                return None
+        if user is None or not user.is_authenticated:
+            return None
+        staff_profile = getattr(user, 'staff', None)
+        return staff_profile.organization_id if staff_profile else None
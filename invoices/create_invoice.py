@@ -1,68 +1,120 @@
 from reportlab.lib.pagesizes import A4, A6, landscape
 from reportlab.pdfgen import canvas
 from io import BytesIO
-from django.http import HttpResponse
-from .create_invoice_pdf_helpers import draw_footer, draw_header, draw_invoice_info, draw_tearaway_section, draw_table_generator, create_custom_grid, hex_to_rgb
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from .pdf_cache import PDF_LAYOUT_VERSION
+from .create_invoice_pdf_helpers import draw_footer, draw_header, draw_invoice_info, draw_invoice_info_labels, draw_tearaway_section, draw_table_generator, create_custom_grid, hex_to_rgb
+
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+async def pdf_chunks(pdf):
+    """
+    Yield a PDF in chunks, slicing an in-memory buffer through its memoryview
+    and reading an open cached file off the event loop.
+    """
+    try:
+        if isinstance(pdf, BytesIO):
+            with pdf.getbuffer() as view:
+                for position in range(0, view.nbytes, PDF_CHUNK_SIZE):
+                    yield view[position:position + PDF_CHUNK_SIZE].tobytes()
+        else:
+            while chunk := await sync_to_async(pdf.read)(PDF_CHUNK_SIZE):
+                yield chunk
+    finally:
+        pdf.close()
+
+
+def pdf_response(filename, pdf):
+    """ Stream a rendered PDF buffer or cached PDF file without copying the whole document. """
+    size = pdf.getbuffer().nbytes if isinstance(pdf, BytesIO) else pdf.size
+    response = StreamingHttpResponse(pdf_chunks(pdf), content_type='application/pdf')
+    response['Content-Length'] = size
+    response['Content-Disposition'] = content_disposition_header(False, f"{filename}.pdf")
+    return response
+
+
+def render_invoice_pdf(invoice):
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw_invoice_page(c, invoice)
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
 
 
-def create_invoice_pdf(filename, invoice):
+def render_invoice_batch_pdf(invoices):
+    """ Render several invoice render models as consecutive pages of one document on a single canvas. """
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
+    for invoice in invoices:
+        draw_invoice_page(c, invoice)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def draw_invoice_page(c, invoice):
     width, height = A4
     table_width = width - 100
     row_height = 20
-    x_position = width
-    y_position = height - 50
-
-    # Add blue border
-    line_hex_color_code = '#3699ff'
-    fill_hex_color_code = '#f5fdff'
-    c.setStrokeColorRGB(*hex_to_rgb(line_hex_color_code))  # Set stroke color to blue
-    c.setFillColorRGB(*hex_to_rgb(fill_hex_color_code))
-    c.setLineWidth(10)  # Set line width
-    c.rect(0, 0, width, height, stroke=1, fill=1)  # Draw rectangle border
 
-    # # Add logos
-    # logo_path_left = invoice.organization.logo.path  # Update this with the path to your left logo file
-    # logo_path_right = "organization_logos/optic_invoicer_icon2.png"  # Update this with the path to your right logo file
-    # c.drawImage(logo_path_left, 10, height - 60, width=50, height=50)  # Draw left logo
-    # c.drawImage(logo_path_right, width - 90, height - 60, width=50, height=50)  # Draw right logo
+    # The static layer is the same for every invoice of the organization: draw it once
+    # per document as a form XObject and stamp it onto each page
+    layout_name = f"InvoiceLayout{invoice.organization.id}v{PDF_LAYOUT_VERSION}"
+    if not c.hasForm(layout_name):
+        c.beginForm(layout_name)
+        draw_static_layer(c, invoice)
+        c.endForm()
+    c.doForm(layout_name)
 
-    # Set line width
     c.setFillColorRGB(0, 0, 0)
     c.setStrokeColorRGB(0, 0, 0)
-    draw_header(c, x_position, y_position, invoice)
     draw_invoice_info(c, height, invoice)
 
     # Prescription Section
     prescription_y_position = height - 200
     prescription_x_position = 60
     prescription_headers = ["", "SPH", "CYL", "AXIS", "PRISM", "ADD", "IPD."]
-    prescription_data = [
-        ("R",
-         str(invoice.prescription.right_sphere),
-         str(invoice.prescription.right_cylinder),
-         str(invoice.prescription.right_prism),
-         str(invoice.prescription.right_prism),
-         str(invoice.prescription.right_add),
-         str(invoice.prescription.right_ipd)),
-
-        ("L",
-         str(invoice.prescription.left_sphere),
-         str(invoice.prescription.left_cylinder),
-            str(invoice.prescription.left_axis),
-         str(invoice.prescription.left_prism),
-         str(invoice.prescription.left_add),
-         str(invoice.prescription.left_ipd)
-         )]
+    if invoice.prescription:
+        prescription_data = [
+            ("R",
+             str(invoice.prescription.right_sphere),
+             str(invoice.prescription.right_cylinder),
+             str(invoice.prescription.right_axis),
+             str(invoice.prescription.right_prism),
+             str(invoice.prescription.right_add),
+             str(invoice.prescription.right_ipd)),
+
+            ("L",
+             str(invoice.prescription.left_sphere),
+             str(invoice.prescription.left_cylinder),
+             str(invoice.prescription.left_axis),
+             str(invoice.prescription.left_prism),
+             str(invoice.prescription.left_add),
+             str(invoice.prescription.left_ipd)
+             )]
+    else:
+        prescription_data = [("R", "", "", "", "", "", ""), ("L", "", "", "", "", "", "")]
     next_table_y_position = draw_table_generator(c, 7, prescription_headers, prescription_x_position, prescription_y_position, row_height, table_width, prescription_data, "Prescription")
 
+    # Split the invoice lines into frames and lenses in one pass
+    frame_table_data = []
+    lens_table_data = []
+    for line in invoice.lines:
+        if line.item_type == "Frames":
+            frame_table_data.append((line.SKU, line.name, line.description, str(line.sale_value)))
+        elif line.item_type == "Lens":
+            lens_table_data.append((line.SKU, line.name, line.description, str(line.sale_value)))
+
     # Frame Section
     frame_table_y_position = next_table_y_position
     frame_table_header = ["SKU", "Item", "Description", "Price"]
     frame_table_x_position = 60
-    frame_table_data = [(item.SKU, item.name, item.description, str(item.sale_value)) for item in invoice.items.all() if item.item_type == "Frames"]
-
     if len(frame_table_data) == 0:
         frame_table_data.append(("", "", "", ""))
     next_table_y_position = draw_table_generator(c, 4, frame_table_header, frame_table_x_position, frame_table_y_position, row_height, table_width, frame_table_data, "Frames / SG")
@@ -71,8 +123,6 @@ def create_invoice_pdf(filename, invoice):
     lens_table_y_position = next_table_y_position
     lens_table_header = ["S.no", "Item", "Description", "Price"]
     lens_table_x_position = 60
-    lens_table_data = [(item.SKU, item.name, item.description, str(item.sale_value)) for item in invoice.items.all() if item.item_type == "Lens"]
-
     if len(lens_table_data) == 0:
         lens_table_data.append(("", "", "", ""))
     next_table_y_position = draw_table_generator(c, 4, lens_table_header, lens_table_x_position, lens_table_y_position, row_height, table_width, lens_table_data, "Lens")
@@ -91,19 +141,36 @@ def create_invoice_pdf(filename, invoice):
     ]
     next_table_y_position = create_custom_grid(c, grid_structure, 60, next_table_y_position - 30, row_height, 100, delivery_data)
 
-    draw_footer(c, width, invoice)
 
-    c.showPage()
-    c.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename={filename}.pdf'
-    response.write(pdf)
-    return response
+def draw_static_layer(c, invoice):
+    """ Border, background, organization header, field labels and footer of an invoice page. """
+    width, height = A4
+    x_position = width
+    y_position = height - 50
+
+    # Add blue border
+    line_hex_color_code = '#3699ff'
+    fill_hex_color_code = '#f5fdff'
+    c.setStrokeColorRGB(*hex_to_rgb(line_hex_color_code))  # Set stroke color to blue
+    c.setFillColorRGB(*hex_to_rgb(fill_hex_color_code))
+    c.setLineWidth(10)  # Set line width
+    c.rect(0, 0, width, height, stroke=1, fill=1)  # Draw rectangle border
 
+    # # Add logos
+    # logo_path_left = invoice.organization.logo.path  # Update this with the path to your left logo file
+    # logo_path_right = "organization_logos/optic_invoicer_icon2.png"  # Update this with the path to your right logo file
+    # c.drawImage(logo_path_left, 10, height - 60, width=50, height=50)  # Draw left logo
+    # c.drawImage(logo_path_right, width - 90, height - 60, width=50, height=50)  # Draw right logo
 
-def create_invoice_pdf_customer(filename, invoice):
+    # Set line width
+    c.setFillColorRGB(0, 0, 0)
+    c.setStrokeColorRGB(0, 0, 0)
+    draw_header(c, x_position, y_position, invoice)
+    draw_invoice_info_labels(c, height)
+    draw_footer(c, width, invoice)
+
+
+def render_invoice_pdf_customer(invoice):
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=landscape(A6))
     width, height = landscape(A6)
@@ -124,9 +191,12 @@ def create_invoice_pdf_customer(filename, invoice):
     draw_footer(c, width, invoice)
     c.showPage()
     c.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename={filename}_{invoice.invoice_number}.pdf'
-    response.write(pdf)
-    return response
+    buffer.seek(0)
+    return buffer
+
+
+# Copy type -> renderer; the copy type also names the cache entry and the downloaded file
+PDF_RENDERERS = {
+    "organization_copy": render_invoice_pdf,
+    "customer_copy": render_invoice_pdf_customer,
+}
@@ -103,14 +103,19 @@ def create_custom_grid(c,grid_structure, x_position, y_position, row_height, col
 
 
 
-def draw_invoice_info(c, height, invoice):
+def draw_invoice_info_labels(c, height):
     c.setLineWidth(1)
     c.setFont("Helvetica-Bold", 12)
     c.drawString(50, height - 130, "Invoice No: ")
-    c.drawString(450, height - 130, "{}".format(invoice.date.strftime("%Y-%m-%d")))
     c.drawString(50, height - 170, "Name: ")
     c.drawString(350, height - 170, "Phone: ")
 
+
+def draw_invoice_info(c, height, invoice):
+    c.setLineWidth(1)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(450, height - 130, "{}".format(invoice.date.strftime("%Y-%m-%d")))
+
     c.setFont("Helvetica", 12)
     c.drawString(120, height - 130, "{}".format(invoice.invoice_number))
     c.drawString(90, height - 170, " {} {}".format(invoice.customer.first_name, invoice.customer.last_name))
@@ -0,0 +1,121 @@
+import logging
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import models, transaction
+
+logger = logging.getLogger(__name__)
+
+# Invoice fields carried by live events; invoice.updated only sends the ones that changed
+INVOICE_EVENT_FIELDS = (
+    'invoice_number', 'status', 'total', 'discount', 'tax_percentage', 'advance',
+    'paid_total', 'balance', 'delivery_date', 'remarks', 'is_taxable', 'is_active',
+)
+PAYMENT_INVOICE_FIELDS = ('paid_total', 'balance', 'status')
+
+
+def organization_group(organization_id):
+    return f"invoices_{organization_id}"
+
+
+def field_value(instance, name):
+    """ JSON/msgpack friendly value of a model field, decimals rounded as the database stores them. """
+    value = getattr(instance, name)
+    field = instance._meta.get_field(name)
+    if isinstance(field, models.DecimalField) and value is not None:
+        value = Decimal(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def invoice_values(invoice, fields=INVOICE_EVENT_FIELDS):
+    return {field: field_value(invoice, field) for field in fields}
+
+
+def publish_event(organization_id, event, build_payload):
+    """
+    Send an event to the organization's open InvoicesConsumer sockets once the current
+    transaction commits. The payload is built at commit time so it shows the final state.
+    """
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                organization_group(organization_id),
+                {"type": "invoice.event", "event": event, "data": build_payload()}
+            )
+        except Exception as e:
+            logger.error('Failed to publish %s for organization %s: %s', event, organization_id, e)
+
+    transaction.on_commit(send)
+
+
+def publish_invoice_created(invoice):
+    # Later saves in the same transaction are folded into this event
+    invoice._created_event_pending = True
+
+    def build_payload():
+        invoice._created_event_pending = False
+        invoice._loaded_values = {field: getattr(invoice, field) for field in INVOICE_EVENT_FIELDS}
+        return {
+            "id": str(invoice.id),
+            "customer": invoice.customer_id,
+            "customer_name": f"{invoice.customer.first_name} {invoice.customer.last_name}",
+            "date": field_value(invoice, "date"),
+            **invoice_values(invoice),
+        }
+
+    publish_event(invoice.organization_id, "invoice.created", build_payload)
+
+
+def publish_invoice_updated(invoice):
+    if getattr(invoice, '_created_event_pending', False):
+        return
+    loaded_values = getattr(invoice, '_loaded_values', {})
+    changes = {
+        field: field_value(invoice, field)
+        for field in INVOICE_EVENT_FIELDS
+        if field in loaded_values and loaded_values[field] != getattr(invoice, field)
+    }
+    if not changes:
+        return
+    loaded_values.update({field: getattr(invoice, field) for field in changes})
+    publish_event(invoice.organization_id, "invoice.updated", lambda: {"id": str(invoice.id), **changes})
+
+
+def publish_payment_posted(payment):
+    def build_payload():
+        return {
+            "id": str(payment.id),
+            "invoice": str(payment.invoice_id),
+            "amount": field_value(payment, "amount"),
+            "payment_type": payment.payment_type,
+            "payment_mode": payment.payment_mode,
+            **invoice_values(payment.invoice, PAYMENT_INVOICE_FIELDS),
+        }
+
+    publish_event(payment.organization_id, "payment.posted", build_payload)
+
+
+def publish_payment_removed(payment):
+    """ A deactivated payment only moves the invoice balance, so it goes out as invoice.updated. """
+    publish_event(
+        payment.organization_id, "invoice.updated",
+        lambda: {"id": str(payment.invoice_id), **invoice_values(payment.invoice, PAYMENT_INVOICE_FIELDS)}
+    )
+
+
+def publish_invoices_status_changed(organization_id, invoice_ids, status):
+    """ Bulk status transitions skip post_save, so each moved invoice is announced here. """
+    for invoice_id in invoice_ids:
+        publish_event(
+            organization_id, "invoice.updated",
+            lambda invoice_id=invoice_id: {"id": str(invoice_id), "status": status}
+        )
@@ -0,0 +1,72 @@
+import csv
+import json
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
+from optic_invoicer_api.query_plan import apply_query_plan
+from .serializers import InvoiceGetSerializer
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_LINES = 100
+
+CSV_HEADERS = [
+    "invoice_number", "date", "status", "customer_name", "customer_phone",
+    "is_taxable", "tax_percentage", "discount", "total", "advance", "paid_total", "balance",
+    "item_sku", "item_name", "item_type", "quantity", "sale_value",
+]
+
+
+class _EchoBuffer:
+    """ File-like object that hands back whatever csv.writer writes to it. """
+    def write(self, value):
+        return value
+
+
+def iterate_invoices(queryset):
+    """ Walk the queryset on a server-side cursor, prefetching related rows one chunk at a time. """
+    queryset = apply_query_plan(queryset, InvoiceGetSerializer).order_by('created_on', 'id')
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def ndjson_lines(queryset):
+    for invoice in iterate_invoices(queryset):
+        yield json.dumps(InvoiceGetSerializer(invoice).data, cls=JSONEncoder) + "\n"
+
+
+def csv_lines(queryset):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(CSV_HEADERS)
+    for invoice in iterate_invoices(queryset):
+        invoice_columns = [
+            invoice.invoice_number, invoice.date, invoice.status,
+            f"{invoice.customer.first_name} {invoice.customer.last_name}", invoice.customer.phone,
+            invoice.is_taxable, invoice.tax_percentage, invoice.discount, invoice.total,
+            invoice.advance, invoice.paid_total, invoice.balance,
+        ]
+        invoice_items = invoice.invoiceitem_set.all()
+        if not invoice_items:
+            yield writer.writerow(invoice_columns + [""] * 5)
+        for item in invoice_items:
+            inventory_item = item.inventory_item
+            yield writer.writerow(invoice_columns + [
+                inventory_item.SKU, inventory_item.name, inventory_item.item_type, item.quantity, item.sale_value
+            ])
+
+
+async def stream_lines(lines):
+    """
+    Serve a synchronous line generator to an ASGI server batch by batch.
+    Django would otherwise read a synchronous iterator into memory before sending it.
+    """
+    def next_batch():
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == EXPORT_BATCH_LINES:
+                break
+        return "".join(batch)
+
+    while True:
+        batch = await sync_to_async(next_batch, thread_sensitive=True)()
+        if not batch:
+            break
+        yield batch
@@ -0,0 +1,46 @@
+from django.utils.dateparse import parse_date
+from .models import Invoice
+from .invoice_render_model import invoice_render_queryset
+
+
+def parse_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed_date = parse_date(value)
+    except ValueError:
+        parsed_date = None
+    if not parsed_date:
+        raise ValueError(f"Invalid {name}, expected YYYY-MM-DD.")
+    return parsed_date
+
+
+def filter_invoices(queryset, params):
+    """
+    Narrow an invoice queryset by the common query parameters:
+    start_date / end_date (invoice date), delivery_date and status.
+    """
+    start_date = parse_date_param(params, 'start_date')
+    end_date = parse_date_param(params, 'end_date')
+    delivery_date = parse_date_param(params, 'delivery_date')
+    status = params.get('status')
+
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if delivery_date:
+        queryset = queryset.filter(delivery_date=delivery_date)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def get_print_run_invoices(organization_id, params):
+    """ Active invoices selected for a batch print run, with everything the PDF needs loaded in bulk. """
+    if not any(params.get(name) for name in ('start_date', 'end_date', 'delivery_date', 'status')):
+        raise ValueError("Provide start_date, end_date, delivery_date or status to select invoices.")
+
+    queryset = Invoice.objects.filter(organization_id=organization_id, is_active=True)
+    return invoice_render_queryset(filter_invoices(queryset, params)).order_by('delivery_date', 'invoice_number')
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from django.db.models import Prefetch
+from .models import InvoiceItem
+
+
+# Plain, immutable snapshots of everything an invoice PDF shows. The PDF helpers only
+# read these, so rendering needs no database access and the models can be pickled
+# and sent to a worker process.
+
+@dataclass(frozen=True, slots=True)
+class OrganizationRender:
+    id: int
+    name: str
+    address_first_line: str
+    country: str
+    city: str
+    phone_landline: Optional[str]
+    post_box_number: Optional[str]
+    services: Optional[str]
+    updated_on: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class CustomerRender:
+    first_name: str
+    last_name: str
+    phone: str
+    updated_on: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class PrescriptionRender:
+    right_sphere: Optional[float]
+    right_cylinder: Optional[float]
+    right_axis: Optional[int]
+    right_prism: Optional[float]
+    right_add: Optional[float]
+    right_ipd: Optional[float]
+    left_sphere: Optional[float]
+    left_cylinder: Optional[float]
+    left_axis: Optional[int]
+    left_prism: Optional[float]
+    left_add: Optional[float]
+    left_ipd: Optional[float]
+    updated_on: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class InvoiceLineRender:
+    SKU: str
+    name: str
+    description: str
+    item_type: str
+    sale_value: Decimal
+    quantity: int
+
+
+@dataclass(frozen=True, slots=True)
+class InvoiceRender:
+    id: str
+    invoice_number: str
+    date: date
+    delivery_date: Optional[date]
+    remarks: Optional[str]
+    total: Optional[Decimal]
+    advance: Decimal
+    balance: Decimal
+    updated_on: datetime
+    organization: OrganizationRender
+    customer: CustomerRender
+    prescription: Optional[PrescriptionRender]
+    lines: tuple
+
+
+def invoice_render_queryset(queryset):
+    """ Load invoices with everything their PDF needs: one joined query plus one for the lines. """
+    return queryset.select_related('organization', 'customer', 'prescription').prefetch_related(
+        Prefetch('invoiceitem_set', queryset=InvoiceItem.objects.select_related('inventory_item').order_by('id'))
+    )
+
+
+def to_render_model(invoice):
+    """ Build the render model of an invoice loaded through invoice_render_queryset. """
+    organization = invoice.organization
+    customer = invoice.customer
+    prescription = invoice.prescription
+    return InvoiceRender(
+        id=str(invoice.id),
+        invoice_number=invoice.invoice_number,
+        date=invoice.date,
+        delivery_date=invoice.delivery_date,
+        remarks=invoice.remarks,
+        total=invoice.total,
+        advance=invoice.advance,
+        balance=invoice.balance,
+        updated_on=invoice.updated_on,
+        organization=OrganizationRender(
+            id=organization.id,
+            name=organization.name,
+            address_first_line=organization.address_first_line,
+            country=organization.country,
+            city=organization.city,
+            phone_landline=organization.phone_landline,
+            post_box_number=organization.post_box_number,
+            services=organization.services,
+            updated_on=organization.updated_on,
+        ),
+        customer=CustomerRender(
+            first_name=customer.first_name,
+            last_name=customer.last_name,
+            phone=customer.phone,
+            updated_on=customer.updated_on,
+        ),
+        prescription=PrescriptionRender(
+            right_sphere=prescription.right_sphere,
+            right_cylinder=prescription.right_cylinder,
+            right_axis=prescription.right_axis,
+            right_prism=prescription.right_prism,
+            right_add=prescription.right_add,
+            right_ipd=prescription.right_ipd,
+            left_sphere=prescription.left_sphere,
+            left_cylinder=prescription.left_cylinder,
+            left_axis=prescription.left_axis,
+            left_prism=prescription.left_prism,
+            left_add=prescription.left_add,
+            left_ipd=prescription.left_ipd,
+            updated_on=prescription.updated_on,
+        ) if prescription else None,
+        lines=tuple(
+            InvoiceLineRender(
+                SKU=item.inventory_item.SKU or "",
+                name=item.inventory_item.name,
+                description=item.inventory_item.description or "",
+                item_type=item.inventory_item.item_type,
+                # Price snapshot taken when the line was added, not the current inventory price
+                sale_value=item.sale_value,
+                quantity=item.quantity,
+            )
+            for item in invoice.invoiceitem_set.all()
+        ),
+    )
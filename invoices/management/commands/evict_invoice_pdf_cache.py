@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from invoices.pdf_cache import invoice_pdf_cache
+
+
+class Command(BaseCommand):
+    help = 'Drop least recently used rendered invoice PDFs until the cache fits in INVOICE_PDF_CACHE_MAX_BYTES'
+
+    def handle(self, *args, **options):
+        deleted = invoice_pdf_cache.evict()
+        self.stdout.write(self.style.SUCCESS(f'Evicted {deleted} cached invoice PDFs'))
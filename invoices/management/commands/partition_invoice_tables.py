@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from invoices.partitioning import PARTITIONED_MODELS, convert_sql, future_partitions_sql, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the coming years\' partitions of the year-partitioned invoice tables. '
+        'With --convert, first turn the invoice, invoice item and invoice payment tables into '
+        'tables partitioned by the year of the invoice\'s created_on and move their rows (locks the '
+        'tables while it runs). Invoice numbers then stay unique across partitions through the '
+        'invoices_invoice_number table, which a trigger on the invoice table keeps in step; lines '
+        'and payments keep a foreign key to their invoice on (invoice_id, invoice_created_on).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Partition the tables that are not partitioned yet')
+        parser.add_argument('--years-ahead', type=int, default=1, help='Years after the current one to create partitions for')
+        parser.add_argument('--dry-run', action='store_true', help='Print the SQL without running it')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Invoice table partitioning needs PostgreSQL')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Tables converted here get their future partitions as part of the conversion
+            statements = convert_sql(cursor, options['years_ahead']) if options['convert'] else []
+            statements += future_partitions_sql(cursor, options['years_ahead'])
+
+            for model in PARTITIONED_MODELS:
+                table = model._meta.db_table
+                if not options['convert'] and not is_partitioned(cursor, table):
+                    self.stdout.write(self.style.WARNING(f'{table} is not partitioned, run with --convert to partition it'))
+
+            for statement in statements:
+                self.stdout.write(f'{statement};')
+                if not options['dry_run']:
+                    cursor.execute(statement)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {len(statements)} statements not executed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Executed {len(statements)} partitioning statements'))
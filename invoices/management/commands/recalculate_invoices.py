@@ -1,38 +1,135 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from invoices.models import Invoice, InvoicePayment, InvoiceItem
+from organizations.metrics import schedule_daily_metrics_refresh
+
+AMOUNT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+def invoice_sum(queryset, expression):
+    """ Correlated subquery summing `expression` over the rows of one invoice, 0 when there are none. """
+    total = queryset.filter(invoice=OuterRef('pk')).order_by().values('invoice').annotate(
+        total=Sum(expression, output_field=AMOUNT_FIELD)
+    ).values('total')
+    return Coalesce(Subquery(total), Value(0), output_field=AMOUNT_FIELD)
+
+
+def recalculated_invoices(organization_id, since=None):
+    """ Taxable invoices of an organization annotated with their line total and active payment sums. """
+    active_payments = InvoicePayment.objects.filter(is_active=True)
+    queryset = Invoice.objects.filter(organization_id=organization_id, is_taxable=True)
+    if since:
+        queryset = queryset.filter(updated_on__date__gte=since)
+    return queryset.only(
+        'id', 'invoice_number', 'discount', 'tax_percentage', 'total', 'balance', 'paid_total', 'created_on'
+    ).annotate(
+        items_total=invoice_sum(InvoiceItem.objects.all(), F('sale_value') * F('quantity')),
+        advance_paid=invoice_sum(active_payments.filter(payment_type="Advance"), 'amount'),
+        payments_paid=invoice_sum(active_payments.exclude(payment_type="Advance"), 'amount'),
+    ).order_by('id')
+
+
+def parse_since(value):
+    since = parse_date(value)
+    if not since:
+        raise argparse.ArgumentTypeError("expected YYYY-MM-DD")
+    return since
 
 
 class Command(BaseCommand):
-    help = 'Recalculate total and balance for all taxable invoices'
+    help = 'Recalculate total, paid total and balance for taxable invoices'
 
-    def handle(self, *args, **kwargs):
-        taxable_invoices = Invoice.objects.filter(is_taxable=True)
+    BATCH_SIZE = 500
+    PROGRESS_WIDTH = 30
 
-        for invoice in taxable_invoices:
-            try:
-                # Calculate the total from related InvoiceItem objects
-                total_without_tax = sum(
-                    item.sale_value * item.quantity for item in InvoiceItem.objects.filter(invoice=invoice)
-                )
-                total_without_tax = total_without_tax - invoice.discount
-                # Add the tax
-                tax_amount = (invoice.tax_percentage / 100) * total_without_tax
-                new_total = total_without_tax + tax_amount
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, action='append', help='Only this organization id (repeatable)')
+        parser.add_argument('--since', type=parse_since, help='Only invoices updated on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without saving them')
+        parser.add_argument('--workers', type=int, default=1, help='Organizations processed in parallel')
+
+    def handle(self, *args, **options):
+        organizations = Invoice.objects.filter(is_taxable=True)
+        if options['organization']:
+            organizations = organizations.filter(organization_id__in=options['organization'])
+        if options['since']:
+            organizations = organizations.filter(updated_on__date__gte=options['since'])
+        organization_ids = list(organizations.order_by().values_list('organization_id', flat=True).distinct())
 
-                # Calculate the total payments
-                payments = InvoicePayment.objects.filter(invoice=invoice, is_active=True)
-                total_payments = sum(payment.amount for payment in payments if payment.payment_type in ["Advance", "General"])
+        changes = []
+        done = 0
+        self.write_progress(done, len(organization_ids))
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            futures = [
+                executor.submit(self.recalculate_organization, organization_id, options['since'], options['dry_run'])
+                for organization_id in organization_ids
+            ]
+            for future in as_completed(futures):
+                changes.extend(future.result())
+                done += 1
+                self.write_progress(done, len(organization_ids))
+        self.stdout.write('')
+
+        if options['dry_run']:
+            for invoice, total, paid_total, balance in sorted(changes, key=lambda change: change[0].invoice_number):
+                self.stdout.write(
+                    f'{invoice.invoice_number}: total {invoice.total} -> {total}, '
+                    f'paid total {invoice.paid_total} -> {paid_total}, balance {invoice.balance} -> {balance}'
+                )
+            self.stdout.write(self.style.WARNING(f'Dry run: {len(changes)} invoices would change'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Recalculation completed: {len(changes)} invoices updated'))
 
-                # Calculate the new balance
-                new_balance = new_total - total_payments
+    def recalculate_organization(self, organization_id, since, dry_run):
+        """
+        Recalculate one organization's invoices: one annotated read, then chunked bulk updates.
+        Runs in a worker thread, which uses and then closes its own database connection.
+        """
+        try:
+            with transaction.atomic():
+                invoices = recalculated_invoices(organization_id, since)
+                if not dry_run:
+                    invoices = invoices.select_for_update(of=('self',))
 
-                # Update the invoice
-                invoice.total = new_total
-                invoice.balance = new_balance
-                invoice.save()
+                changes = []
+                for invoice in invoices:
+                    total_without_tax = invoice.items_total - (invoice.discount or 0)
+                    tax_amount = ((invoice.tax_percentage or 0) / 100) * total_without_tax
+                    total = (total_without_tax + tax_amount).quantize(CENT)
+                    balance = total - invoice.advance_paid - invoice.payments_paid
+                    if (invoice.total, invoice.paid_total, invoice.balance) != (total, invoice.payments_paid, balance):
+                        changes.append((invoice, total, invoice.payments_paid, balance))
 
-                self.stdout.write(self.style.SUCCESS(f'Updated Invoice {invoice.invoice_number} - New Total: {new_total}, New Balance: {new_balance}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error updating Invoice {invoice.invoice_number}: {str(e)}'))
+                if not dry_run:
+                    now = timezone.now()
+                    updated_invoices = []
+                    for invoice, total, paid_total, balance in changes:
+                        invoice.total = total
+                        invoice.paid_total = paid_total
+                        invoice.balance = balance
+                        # Bumping updated_on also retires any cached PDF of the invoice
+                        invoice.updated_on = now
+                        updated_invoices.append(invoice)
+                    Invoice.objects.bulk_update(
+                        updated_invoices, ['total', 'paid_total', 'balance', 'updated_on'], batch_size=self.BATCH_SIZE
+                    )
+                    # bulk_update sends no post_save, so the days' rollups are refreshed here
+                    for invoice in updated_invoices:
+                        schedule_daily_metrics_refresh(organization_id, invoice.created_on, "invoices")
+            return changes
+        finally:
+            connection.close()
 
-        self.stdout.write(self.style.SUCCESS('Recalculation completed'))
+    def write_progress(self, done, total):
+        filled = self.PROGRESS_WIDTH * done // total if total else self.PROGRESS_WIDTH
+        bar = '#' * filled + '-' * (self.PROGRESS_WIDTH - filled)
+        self.stdout.write(f'\r[{bar}] {done}/{total} organizations', ending='')
+        self.stdout.flush()
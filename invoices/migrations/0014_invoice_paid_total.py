@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 08:48
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_paid_total(apps, schema_editor):
+    Invoice = apps.get_model('invoices', 'Invoice')
+    InvoicePayment = apps.get_model('invoices', 'InvoicePayment')
+    paid_total = InvoicePayment.objects.filter(
+        invoice=OuterRef('pk'),
+        is_active=True
+    ).exclude(payment_type="Advance").values('invoice').annotate(total=Sum('amount')).values('total')
+    Invoice.objects.update(
+        paid_total=Coalesce(Subquery(paid_total), Value(0), output_field=DecimalField(max_digits=10, decimal_places=2))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0013_alter_invoicepayment_invoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_paid_total, migrations.RunPython.noop),
+    ]
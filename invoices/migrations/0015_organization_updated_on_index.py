@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0014_invoice_paid_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['organization', 'updated_on', 'id'], name='invoice_org_updated_idx'),
+        ),
+    ]
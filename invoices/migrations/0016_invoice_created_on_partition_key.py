@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 09:05
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_invoice_created_on(apps, schema_editor):
+    Invoice = apps.get_model('invoices', 'Invoice')
+    InvoiceItem = apps.get_model('invoices', 'InvoiceItem')
+    InvoicePayment = apps.get_model('invoices', 'InvoicePayment')
+    invoice_created_on = Subquery(Invoice.objects.filter(pk=OuterRef('invoice_id')).values('created_on')[:1])
+    InvoiceItem.objects.update(invoice_created_on=invoice_created_on)
+    # Payments without an invoice keep their own creation time
+    InvoicePayment.objects.update(invoice_created_on=Coalesce(invoice_created_on, F('created_on')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0015_organization_updated_on_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='invoice_created_on',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='invoicepayment',
+            name='invoice_created_on',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_invoice_created_on, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0016_invoice_created_on_partition_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['organization', 'created_on'], name='invoice_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicepayment',
+            index=models.Index(fields=['organization', 'created_on'], name='payment_org_created_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 from uuid import uuid4
-from organizations.models import Organization
+from organizations.models import Organization, DocumentSequence
 from django.contrib.auth.models import User
 from customers.models import Customer, Prescription
 from inventory.models import Inventory
@@ -28,6 +30,8 @@ class Invoice(models.Model):
     advance_payment_mode = models.CharField(max_length=10, choices=PAYMENT_MODE_CHOICES, default="Cash")
     tax_percentage = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=5)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Sum of active non-advance payments, maintained by InvoicePayment
+    paid_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     STATUS_CHOICES = [
         ("Created", "Created"),
         ("Advanced", "Advanced"),
@@ -46,6 +50,14 @@ class Invoice(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Delta sync walks an organization's changes in (updated_on, id) order
+            models.Index(fields=['organization', 'updated_on', 'id'], name='invoice_org_updated_idx'),
+            # Daily metrics aggregate an organization's invoices by created_on day
+            models.Index(fields=['organization', 'created_on'], name='invoice_org_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.invoice_number} {self.customer.first_name} on {self.created_on}"
 
@@ -56,17 +68,21 @@ class Invoice(models.Model):
         # Get the current year
         year = datetime.now().year
 
-        # Get the count of invoices for the current year and organization
-        count = Invoice.objects.filter(
-            organization=self.organization,
-            created_on__year=year
-        ).count() + 1  # Add 1 for the current invoice
+        # Draw the next number from the organization's invoice sequence for the year
+        count = DocumentSequence.next_value(self.organization_id, "Invoice", year, self.is_taxable)
         # Return the formatted invoice number
         if self.is_taxable:
             return f"{prefix}{year}{count:05}"
         else:
             return f"{prefix}NT{year}{count:05}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values as loaded, so live invoice.updated events only carry the changed fields
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         # Flag to check if the instance is new
         is_new = self._state.adding
@@ -93,6 +109,9 @@ class InvoiceItem(models.Model):
     sale_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Sale Value Snapshot", default=0)
     cost_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Cost Value Snapshot", default=0)
     quantity = models.IntegerField(default=1)
+    # The invoice's created_on: partition key when the invoice tables are partitioned by year
+    # (see invoices.partitioning), so lines always sit in their invoice's partition
+    invoice_created_on = models.DateTimeField(editable=False)
 
     class Meta:
         unique_together = ('invoice', 'inventory_item')
@@ -101,6 +120,7 @@ class InvoiceItem(models.Model):
         if self._state.adding:
             self.sale_value = self.inventory_item.sale_value
             self.cost_value = self.inventory_item.cost_value
+            self.invoice_created_on = self.invoice.created_on
 
         super(InvoiceItem, self).save(*args, **kwargs)
 
@@ -129,6 +149,8 @@ class InvoicePayment(models.Model):
     payment_mode = models.CharField(max_length=10, choices=PAYMENT_MODE_CHOICES, default="Cash")
     remarks = models.TextField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # The invoice's created_on, partition key like InvoiceItem.invoice_created_on
+    invoice_created_on = models.DateTimeField(editable=False)
 
     # Default fields
     created_by = models.ForeignKey(User, related_name="invoice_payment_created", on_delete=models.SET_NULL, null=True)
@@ -137,6 +159,12 @@ class InvoicePayment(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Daily metrics aggregate an organization's payments by created_on day
+            models.Index(fields=['organization', 'created_on'], name='payment_org_created_idx'),
+        ]
+
     def __str__(self):
         if self.invoice:
             return f"{self.invoice_number} {self.payment_type} > {self.amount}"
@@ -145,16 +173,22 @@ class InvoicePayment(models.Model):
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
+            is_new = self._state.adding
             # Perform validations
             self.validate_invoice()
-            self.validate_payment_editing()
+            is_deactivation = self.validate_payment_editing()
             self.validate_invoice_status()
+            if is_new:
+                self.invoice_created_on = self.invoice.created_on
 
             # If validations pass, proceed to save
             super(InvoicePayment, self).save(*args, **kwargs)
 
             # Adjust the invoice balance after saving
-            self.adjust_invoice_balance()
+            if is_new and self.is_active:
+                self.adjust_invoice_balance(self.amount)
+            elif is_deactivation:
+                self.adjust_invoice_balance(-self.amount)
 
     def validate_invoice(self):
         """ Ensure that an invoice is set for the payment. """
@@ -162,32 +196,39 @@ class InvoicePayment(models.Model):
             raise ValueError("Invoice must be set for the payment")
 
     def validate_payment_editing(self):
-        """ Prevent editing of existing active payments. """
+        """ Prevent editing of existing active payments. Returns True when the save deactivates one. """
         if self._state.adding or not InvoicePayment.objects.filter(pk=self.pk, is_active=True).exists():
-            return
-        if not self.is_active:
-            super(InvoicePayment, self).save(update_fields=['is_active'])
-        else:
+            return False
+        if self.is_active:
             raise ValueError("Editing existing payments is not allowed")
+        return True
 
     def validate_invoice_status(self):
         """ Check if the invoice is in a state that allows adding payments. """
         if self.invoice.status in ["Scrapped", "Paid"]:
             raise ValueError("Cannot add payment for Completed/Scrapped Invoice")
 
-    def adjust_invoice_balance(self):
-        """ Adjust the invoice balance for new payments. """
-        if self.payment_type == "Advance":
+    def adjust_invoice_balance(self, amount):
+        """
+        Move `amount` from the invoice balance to its paid total (negative to reverse a payment).
+        Done in a single conditional UPDATE so concurrent payments cannot overwrite each other.
+        """
+        if self.payment_type == "Advance" or not amount:
             return
 
-        total_payments = sum(payment.amount for payment in self.invoice.invoice_payment.all() if payment.payment_type != "Advance")
-        self.invoice.balance = self.invoice.total - (total_payments + self.invoice.advance)
-
-        if self.invoice.balance < 0:
+        updated = Invoice.objects.filter(pk=self.invoice_id, balance__gte=amount).update(
+            paid_total=F('paid_total') + amount,
+            balance=F('balance') - amount,
+            status=Case(
+                When(balance=amount, then=Value("Paid")),
+                When(status="Paid", then=Value("Created")),
+                default=F('status')
+            ),
+            updated_on=timezone.now()
+        )
+        if not updated:
             raise ValueError("Total payments exceed the invoice amount")
-        if self.invoice.balance == 0:
-            self.invoice.status = "Paid"
-        self.invoice.save()
+        self.invoice.refresh_from_db(fields=['paid_total', 'balance', 'status', 'updated_on'])
 
     def delete(self, *args, **kwargs):
         if self.invoice.status in ["Delivered", "Scrapped"]:
@@ -195,11 +236,9 @@ class InvoicePayment(models.Model):
             raise ValueError("Cannot delete payment for delivered or scrapped invoices")
 
         if self.is_active:
-            # Mark as deleted (soft delete) and adjust the invoice balance
+            # Mark as deleted (soft delete), save adjusts the invoice balance
             self.is_active = False
-            self.save(update_fields=["is_active"])
-            self.invoice.balance += self.amount
-            self.invoice.save()
+            self.save(update_fields=["is_active", "updated_on"])
         else:
             # If already marked as deleted, raise an exception
             raise ValueError("This payment has already been deleted")
@@ -0,0 +1,226 @@
+"""
+Opt-in yearly range partitioning of the invoice tables (PostgreSQL).
+
+Invoices are partitioned on created_on. Lines and payments are partitioned on
+invoice_created_on, a copy of their invoice's created_on, so an invoice and everything
+hanging off it always share a year's partitions and can be joined or dropped together.
+
+Converting a table rebuilds it as a partitioned table with one partition per year and
+a default partition, then copies the rows over. PostgreSQL requires every unique
+constraint of a partitioned table to include the partition key, so after conversion:
+
+- primary keys become (id, partition key) and the other unique constraints gain the
+  partition key, which leaves (invoice, inventory item) on lines exactly as unique as before;
+- invoice numbers stay unique across all years through invoices_invoice_number, a plain
+  table keyed on the number that a trigger on the invoice table keeps in step;
+- lines and payments reference their invoice by (invoice_id, invoice_created_on);
+  the Invoice.items many-to-many table loses its key to the invoice table (Django still
+  clears it when an invoice is deleted), foreign keys to other tables are kept.
+"""
+from django.db import connection, models
+from django.utils import timezone
+from .models import Invoice, InvoiceItem, InvoicePayment
+
+# Partitioned model -> the column it is partitioned on
+PARTITION_KEYS = {
+    Invoice: 'created_on',
+    InvoiceItem: 'invoice_created_on',
+    InvoicePayment: 'invoice_created_on',
+}
+PARTITIONED_MODELS = tuple(PARTITION_KEYS)
+# Models referencing their invoice by (invoice_id, invoice_created_on) once partitioned
+INVOICE_CHILD_MODELS = (InvoiceItem, InvoicePayment)
+INVOICE_NUMBER_TABLE = 'invoices_invoice_number'
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def partition_name(table, year):
+    return f"{table}_y{year}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partition_years(cursor, table):
+    """ Years that already have a partition. """
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(%s)",
+        [table]
+    )
+    prefix = f"{table}_y"
+    return {
+        int(name[len(prefix):]) for (name,) in cursor.fetchall()
+        if name.startswith(prefix) and name[len(prefix):].isdigit()
+    }
+
+
+def create_partition_sql(table, year):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {quote(partition_name(table, year))} PARTITION OF {quote(table)} "
+        f"FOR VALUES FROM ('{year}-01-01 00:00:00+00') TO ('{year + 1}-01-01 00:00:00+00')"
+    )
+
+
+def future_partitions_sql(cursor, years_ahead):
+    """ Statements creating the missing partitions from this year to `years_ahead` years out. """
+    current_year = timezone.now().year
+    statements = []
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if not is_partitioned(cursor, table):
+            continue
+        existing = partition_years(cursor, table)
+        statements.extend(
+            create_partition_sql(table, year)
+            for year in range(current_year, current_year + years_ahead + 1)
+            if year not in existing
+        )
+    return statements
+
+
+def unique_column_sets(model):
+    """
+    Column lists of the model's unique constraints other than the primary key and
+    the invoice number, which is kept unique by the invoice number table.
+    """
+    meta = model._meta
+    column_sets = [
+        [field.column] for field in meta.local_fields
+        if field.unique and not field.primary_key and not (model is Invoice and field.name == 'invoice_number')
+    ]
+    column_sets.extend([meta.get_field(name).column for name in fields] for fields in meta.unique_together)
+    column_sets.extend(
+        [meta.get_field(name).column for name in constraint.fields]
+        for constraint in meta.constraints
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields
+    )
+    return column_sets
+
+
+def invoice_number_sql():
+    """
+    Statements creating the invoice number table from the invoices and the trigger keeping it in
+    step: numbers are released on delete or change and claimed on insert or change, so a number
+    used by any invoice in any partition fails the claim with a unique violation.
+    """
+    invoice_table = Invoice._meta.db_table
+    number_column = Invoice._meta.get_field('invoice_number')
+    function = quote(f"{INVOICE_NUMBER_TABLE}_claim")
+    return [
+        f"CREATE TABLE {quote(INVOICE_NUMBER_TABLE)} ("
+        f"invoice_number varchar({number_column.max_length}) PRIMARY KEY, invoice_id uuid NOT NULL)",
+        f"INSERT INTO {quote(INVOICE_NUMBER_TABLE)} (invoice_number, invoice_id) "
+        f"SELECT {quote(number_column.column)}, {quote(Invoice._meta.pk.column)} FROM {quote(invoice_table)}",
+        f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$\n"
+        f"BEGIN\n"
+        f"    IF TG_OP IN ('UPDATE', 'DELETE') THEN\n"
+        f"        DELETE FROM {quote(INVOICE_NUMBER_TABLE)} WHERE invoice_number = OLD.invoice_number AND invoice_id = OLD.id;\n"
+        f"    END IF;\n"
+        f"    IF TG_OP IN ('INSERT', 'UPDATE') THEN\n"
+        f"        INSERT INTO {quote(INVOICE_NUMBER_TABLE)} (invoice_number, invoice_id) VALUES (NEW.invoice_number, NEW.id);\n"
+        f"    END IF;\n"
+        f"    RETURN NULL;\n"
+        f"END\n"
+        f"$$ LANGUAGE plpgsql",
+        f"CREATE TRIGGER {quote(f'{invoice_table}_number_unique')} "
+        f"AFTER INSERT OR DELETE OR UPDATE OF {quote(number_column.column)} ON {quote(invoice_table)} "
+        f"FOR EACH ROW EXECUTE FUNCTION {function}()",
+    ]
+
+
+def invoice_foreign_key_sql(model):
+    """ Composite key from a line or payment table to the partitioned invoice table. """
+    table = model._meta.db_table
+    invoice = model._meta.get_field('invoice')
+    invoice_table = Invoice._meta.db_table
+    return (
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f'{table}_invoice_partition_fk')} "
+        f"FOREIGN KEY ({quote(invoice.column)}, {quote(PARTITION_KEYS[model])}) "
+        f"REFERENCES {quote(invoice_table)} ({quote(Invoice._meta.pk.column)}, {quote(PARTITION_KEYS[Invoice])}) "
+        f"DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def convert_sql(cursor, years_ahead):
+    """ Statements converting every invoice table that is not partitioned yet, to run in one transaction. """
+    tables = [
+        model._meta.db_table for model in PARTITIONED_MODELS if not is_partitioned(cursor, model._meta.db_table)
+    ]
+    if not tables:
+        return []
+    partitioned_tables = {model._meta.db_table for model in PARTITIONED_MODELS}
+
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid), confrelid::regclass::text "
+        "FROM pg_constraint WHERE contype = 'f' "
+        "AND (conrelid = ANY(%s::regclass[]) OR confrelid = ANY(%s::regclass[]))",
+        [tables, tables]
+    )
+    foreign_keys = cursor.fetchall()
+    statements = [
+        f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}" for table, name, _, _ in foreign_keys
+    ]
+
+    current_year = timezone.now().year
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if table not in tables:
+            continue
+        partition_key = PARTITION_KEYS[model]
+        legacy = f"{table}_unpartitioned"
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = to_regclass(%s) AND NOT indisunique AND NOT indisprimary",
+            [table]
+        )
+        index_definitions = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(f"SELECT EXTRACT(YEAR FROM MIN({quote(partition_key)}))::int FROM {quote(table)}")
+        first_year = cursor.fetchone()[0] or current_year
+
+        statements.append(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        statements.append(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+            f"INCLUDING IDENTITY INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE ({quote(partition_key)})"
+        )
+        statements.extend(create_partition_sql(table, year) for year in range(first_year, current_year + years_ahead + 1))
+        statements.append(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {quote(table)} DEFAULT")
+        statements.append(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}")
+        statements.append(f"DROP TABLE {quote(legacy)}")
+        # Keys and indexes are built once the old table and its index names are gone
+        statements.append(
+            f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(model._meta.pk.column)}, {quote(partition_key)})"
+        )
+        for columns in unique_column_sets(model):
+            index_name = f"{table}_{'_'.join(columns)}_uniq"[:63]
+            statements.append(
+                f"CREATE UNIQUE INDEX {quote(index_name)} ON {quote(table)} "
+                f"({', '.join(quote(column) for column in columns + [partition_key])})"
+            )
+        # Read under the original table name, which is the partitioned table now
+        statements.extend(index_definitions)
+        if isinstance(model._meta.pk, models.AutoField):
+            column = model._meta.pk.column
+            statements.append(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), COALESCE(MAX({quote(column)}), 1)) "
+                f"FROM {quote(table)}"
+            )
+
+    if Invoice._meta.db_table in tables:
+        statements.extend(invoice_number_sql())
+    statements.extend(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+        for table, name, definition, referenced_table in foreign_keys
+        if referenced_table not in partitioned_tables
+    )
+    statements.extend(
+        invoice_foreign_key_sql(model) for model in INVOICE_CHILD_MODELS if model._meta.db_table in tables
+    )
+    return statements
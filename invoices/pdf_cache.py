@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import threading
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, default_storage
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the rendered layout changes so stale PDFs are never served
+PDF_LAYOUT_VERSION = 1
+CACHE_ROOT = "invoice_pdf_cache"
+# Eviction frees space down to this share of max_bytes, so it does not run again on the next write
+EVICT_TO_RATIO = 0.8
+
+
+class InvoicePDFCache:
+    """
+    Rendered invoice PDFs stored under a digest of everything the document shows
+    (invoice, customer, prescription and organization versions plus the layout version),
+    one directory per invoice so an invoice's entries can be dropped together.
+    """
+
+    def __init__(self, storage, max_bytes=None):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.is_local = isinstance(storage, FileSystemStorage)
+        # Cache size left by this process's last eviction plus the bytes it stored since. Listing the
+        # storage is one request per entry on remote storages, so writes only count and the listing
+        # runs when the count passes max_bytes, or from the evict_invoice_pdf_cache command.
+        self.estimated_bytes = 0
+        self.lock = threading.Lock()
+
+    def get_name(self, invoice, copy_type):
+        parts = [
+            str(invoice.id),
+            copy_type,
+            str(PDF_LAYOUT_VERSION),
+            invoice.updated_on.isoformat(),
+            invoice.organization.updated_on.isoformat(),
+            invoice.customer.updated_on.isoformat(),
+            invoice.prescription.updated_on.isoformat() if invoice.prescription else "",
+        ]
+        digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+        return f"{CACHE_ROOT}/{invoice.id}/{copy_type}-{digest}.pdf"
+
+    def get(self, invoice, copy_type):
+        """ Return the cached PDF as an open file, or None on a miss. The caller closes it. """
+        name = self.get_name(invoice, copy_type)
+        try:
+            cached_file = self.storage.open(name, 'rb')
+        except OSError:
+            return None
+        except Exception as e:
+            logger.error('Invoice PDF cache read failed for %s: %s', name, e)
+            return None
+        if self.is_local:
+            # Refresh the modification time so eviction works least recently used first
+            os.utime(self.storage.path(name))
+        return cached_file
+
+    def set(self, invoice, copy_type, pdf):
+        name = self.get_name(invoice, copy_type)
+        try:
+            if not self.storage.exists(name):
+                content = File(pdf)
+                self.storage.save(name, content)
+                self.count_written(content.size)
+        except Exception as e:
+            logger.error('Invoice PDF cache write failed for %s: %s', name, e)
+        finally:
+            pdf.seek(0)
+
+    def get_or_render(self, invoice, copy_type, render):
+        """ Return the PDF as an open file: the cached one, or a freshly rendered buffer after storing it. """
+        pdf = self.get(invoice, copy_type)
+        if pdf is None:
+            pdf = render(invoice)
+            self.set(invoice, copy_type, pdf)
+        return pdf
+
+    def invalidate(self, invoice_id):
+        directory = f"{CACHE_ROOT}/{invoice_id}"
+        try:
+            _, files = self.storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for file_name in files:
+            self.storage.delete(f"{directory}/{file_name}")
+
+    def count_written(self, size):
+        if not self.max_bytes:
+            return
+        with self.lock:
+            self.estimated_bytes += size
+            if self.estimated_bytes <= self.max_bytes:
+                return
+            # Other writers count from here while this one evicts
+            self.estimated_bytes = 0
+        self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the cache fits in EVICT_TO_RATIO of max_bytes.
+        Returns the number of entries deleted.
+        """
+        if not self.max_bytes:
+            return 0
+        try:
+            directories, _ = self.storage.listdir(CACHE_ROOT)
+        except FileNotFoundError:
+            return 0
+        entries = []
+        for directory in directories:
+            _, files = self.storage.listdir(f"{CACHE_ROOT}/{directory}")
+            for file_name in files:
+                name = f"{CACHE_ROOT}/{directory}/{file_name}"
+                entries.append((self.storage.get_modified_time(name), self.storage.size(name), name))
+
+        total_size = sum(size for _, size, _ in entries)
+        target_size = self.max_bytes * EVICT_TO_RATIO if total_size > self.max_bytes else total_size
+        deleted = 0
+        for _, size, name in sorted(entries):
+            if total_size <= target_size:
+                break
+            self.storage.delete(name)
+            total_size -= size
+            deleted += 1
+        with self.lock:
+            self.estimated_bytes += total_size
+        return deleted
+
+
+def get_invoice_pdf_cache():
+    if settings.INVOICE_PDF_CACHE_BACKEND == "storage":
+        storage = default_storage
+    else:
+        storage = FileSystemStorage(location=settings.INVOICE_PDF_CACHE_DIR)
+    return InvoicePDFCache(storage, settings.INVOICE_PDF_CACHE_MAX_BYTES)
+
+
+invoice_pdf_cache = get_invoice_pdf_cache()
@@ -0,0 +1,72 @@
+import asyncio
+import base64
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .create_invoice import PDF_RENDERERS, pdf_response
+from .pdf_cache import invoice_pdf_cache
+from .tasks import render_invoice_pdf_copy
+
+_executor = None
+
+
+def get_render_executor():
+    """
+    Bounded pool of rendering processes, started on first use. Workers are spawned rather
+    than forked from the server and set Django up once so render models can be unpickled.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.INVOICE_PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+    return _executor
+
+
+def render_pdf_bytes(copy_type, invoice):
+    """ Runs in a pool worker; only the finished document is sent back. """
+    return PDF_RENDERERS[copy_type](invoice).getvalue()
+
+
+def celery_renders_pdfs():
+    """ The queue is only used when the rendered PDF can come back through a result backend. """
+    return bool(getattr(settings, 'CELERY_BROKER_URL', None) and getattr(settings, 'CELERY_RESULT_BACKEND', None))
+
+
+async def render_pdf(copy_type, invoice):
+    if celery_renders_pdfs():
+        result = await sync_to_async(render_invoice_pdf_copy.apply_async, thread_sensitive=False)(
+            (invoice, copy_type), serializer='pickle'
+        )
+        encoded = await sync_to_async(result.get, thread_sensitive=False)(timeout=settings.INVOICE_PDF_RENDER_TIMEOUT)
+        return base64.b64decode(encoded)
+
+    global _executor
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(get_render_executor(), render_pdf_bytes, copy_type, invoice)
+        return await asyncio.wait_for(future, settings.INVOICE_PDF_RENDER_TIMEOUT)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next request
+        _executor = None
+        raise
+
+
+async def get_invoice_pdf(copy_type, invoice):
+    """ The cached PDF as an open file, or a buffer rendered outside the server process. """
+    pdf = await sync_to_async(invoice_pdf_cache.get)(invoice, copy_type)
+    if pdf is None:
+        pdf = BytesIO(await render_pdf(copy_type, invoice))
+        await sync_to_async(invoice_pdf_cache.set)(invoice, copy_type, pdf)
+    return pdf
+
+
+async def invoice_pdf_response(copy_type, invoice, filename=None):
+    pdf = await get_invoice_pdf(copy_type, invoice)
+    return pdf_response(filename or copy_type, pdf)
@@ -1,7 +1,8 @@
 # invoices/routing.py
-from django.urls import path
-from . import consumers  
+from django.urls import re_path
+from . import consumers
 
 websocket_urlpatterns = [
-    path('ws/invoice/', consumers.InvoicesConsumer.as_asgi()),
+    # ws/invoices/ is the endpoint; ws/invoice/ is kept for clients already using it
+    re_path(r'^ws/invoices?/$', consumers.InvoicesConsumer.as_asgi()),
 ]
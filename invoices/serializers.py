@@ -1,17 +1,76 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 from .models import Invoice, InvoicePayment, InvoiceItem
 from inventory.models import Inventory
 from customers.serializers import CustomerSerializer, PrescriptionSerializer
 from customers.models import Customer, Prescription
+from .bulk_status import STATUS_TRANSITIONS, BULK_STATUS_MAX_INVOICES
+
+
+def merge_invoice_lines(inventory_items):
+    """ Collapse validated invoice lines into {inventory id: quantity}, merging repeated items. """
+    required_quantities = {}
+    for item_data in inventory_items:
+        inventory_item_id = item_data['inventory_item']
+        required_quantities[inventory_item_id] = required_quantities.get(inventory_item_id, 0) + item_data['quantity']
+    return required_quantities
+
+
+def adjust_inventory_stock(organization, quantity_changes):
+    """
+    Apply net stock changes ({inventory id: quantity taken}, negative to return stock)
+    in bulk. All affected rows are locked in a single query and every shortfall is
+    reported in one validation error. Returns the locked Inventory rows by id.
+    """
+    # Locks are taken in id order so invoices sharing items cannot deadlock each other
+    inventory_items = {
+        inventory_item.id: inventory_item
+        for inventory_item in Inventory.objects.select_for_update().filter(
+            organization=organization,
+            id__in=quantity_changes.keys()
+        ).order_by('id')
+    }
+
+    errors = [
+        f"Item {inventory_id} does not exist."
+        for inventory_id in quantity_changes if inventory_id not in inventory_items
+    ]
+    errors += [
+        f"Item {inventory_items[inventory_id].name} is out of stock or insufficient quantity."
+        for inventory_id, quantity in quantity_changes.items()
+        if inventory_id in inventory_items and inventory_items[inventory_id].qty < quantity
+    ]
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    changed_items = []
+    now = timezone.now()
+    for inventory_id, quantity in quantity_changes.items():
+        if quantity == 0:
+            continue
+        inventory_item = inventory_items[inventory_id]
+        inventory_item.qty -= quantity
+        if inventory_item.qty == 0:
+            inventory_item.status = "Out of Stock"
+        elif inventory_item.status == "Out of Stock":
+            inventory_item.status = "Stocked"
+        inventory_item.updated_on = now
+        changed_items.append(inventory_item)
+    Inventory.objects.bulk_update(changed_items, ['qty', 'status', 'updated_on'])
+
+    return inventory_items
 
 
 class InvoiceItemWriteSerializer(serializers.ModelSerializer):
-    inventory_item = serializers.PrimaryKeyRelatedField(queryset=Inventory.objects.all())
+    # Plain id: the inventory rows are fetched (and locked) in bulk when the invoice is saved
+    inventory_item = serializers.IntegerField()
 
     class Meta:
         model = InvoiceItem
         fields = ['inventory_item', 'quantity']
+        extra_kwargs = {'quantity': {'min_value': 1}}
 
 
 class InvoiceCreateSerializer(serializers.ModelSerializer):
@@ -22,7 +81,7 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Invoice
         fields = '__all__'
-        read_only_fields = ('organization',)
+        read_only_fields = ('organization', 'paid_total')
 
     @transaction.atomic
     def create(self, validated_data):
@@ -55,6 +114,10 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
                 # Link existing Prescription to the invoice
                 prescription = Prescription.objects.get(id=prescription_id)
 
+        # Reserve stock for every line at once
+        required_quantities = merge_invoice_lines(inventory_items)
+        locked_items = adjust_inventory_stock(self.context['request'].get_organization(), required_quantities)
+
         # Create the Invoice
         invoice = Invoice.objects.create(
             customer=customer,
@@ -65,30 +128,19 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         )
         total_price = 0
 
-        for item_data in inventory_items:
-            inventory_item_id = item_data['inventory_item']
-            inventory_item = Inventory.objects.get(id=inventory_item_id.id)
-            required_quantity = item_data['quantity']
-
-            if inventory_item.qty < required_quantity:
-                raise serializers.ValidationError(
-                    f"Item {inventory_item.name} is out of stock or insufficient quantity."
-                )
-
-            InvoiceItem.objects.create(
+        invoice_items = []
+        for inventory_item_id, required_quantity in required_quantities.items():
+            inventory_item = locked_items[inventory_item_id]
+            invoice_items.append(InvoiceItem(
                 invoice=invoice,
                 inventory_item=inventory_item,
                 quantity=required_quantity,
                 sale_value=inventory_item.sale_value,  # Capture the current sale value
                 cost_value=inventory_item.cost_value,   # Capture the current cost value,
-            )
-
-            # Update Inventory
-            inventory_item.qty -= required_quantity
-            if inventory_item.qty == 0:
-                inventory_item.status = "Out of Stock"
-            inventory_item.save()
+                invoice_created_on=invoice.created_on,
+            ))
             total_price += inventory_item.sale_value * required_quantity
+        InvoiceItem.objects.bulk_create(invoice_items)
 
         invoice.total = total_price - invoice.discount
         if invoice.is_taxable:
@@ -109,7 +161,7 @@ class InvoiceUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Invoice
         fields = '__all__'
-        read_only_fields = ('organization',)
+        read_only_fields = ('organization', 'paid_total')
 
     def validate(self, data):
         if 'prescription' not in data:
@@ -164,42 +216,53 @@ class InvoiceUpdateSerializer(serializers.ModelSerializer):
 
         # Update inventory items if provided
         if inventory_items is not None:
-            # Restore inventory quantities before deleting InvoiceItems
-            existing_invoice_items = InvoiceItem.objects.filter(invoice=instance)
-            for item in existing_invoice_items:
-                inventory_item = item.inventory_item
-                inventory_item.qty += item.quantity
-                if inventory_item.qty > 0 and inventory_item.status == "Out of Stock":
-                    inventory_item.status = "In Stock"
-                inventory_item.save()
-
-            # Delete existing InvoiceItems
-            existing_invoice_items.delete()
-
-            # Add new InvoiceItems and update inventory quantities
+            # Diff the requested lines against the existing ones and only touch what changed
+            required_quantities = merge_invoice_lines(inventory_items)
+            existing_invoice_items = {
+                item.inventory_item_id: item for item in InvoiceItem.objects.filter(invoice=instance)
+            }
+            quantity_changes = {}
+            for inventory_item_id in existing_invoice_items.keys() | required_quantities.keys():
+                existing_item = existing_invoice_items.get(inventory_item_id)
+                change = required_quantities.get(inventory_item_id, 0) - (existing_item.quantity if existing_item else 0)
+                if change:
+                    quantity_changes[inventory_item_id] = change
+            locked_items = adjust_inventory_stock(instance.organization, quantity_changes)
+
+            removed_item_ids = []
+            changed_items = []
+            added_items = []
             total_price = 0
-            for item_data in inventory_items:
-                inventory_item = item_data['inventory_item']
-                inventory_item = Inventory.objects.get(id=inventory_item.id)
-                required_quantity = item_data['quantity']
-
-                if inventory_item.qty < required_quantity:
-                    raise serializers.ValidationError(f"Item {inventory_item.name} is out of stock or insufficient quantity.")
-
-                InvoiceItem.objects.create(
+            for inventory_item_id, existing_item in existing_invoice_items.items():
+                if inventory_item_id not in required_quantities:
+                    removed_item_ids.append(existing_item.id)
+                    continue
+                if inventory_item_id in quantity_changes:
+                    existing_item.quantity = required_quantities[inventory_item_id]
+                    changed_items.append(existing_item)
+                # Kept lines keep their original sale/cost value snapshots
+                total_price += existing_item.sale_value * existing_item.quantity
+            for inventory_item_id, required_quantity in required_quantities.items():
+                if inventory_item_id in existing_invoice_items:
+                    continue
+                inventory_item = locked_items[inventory_item_id]
+                added_items.append(InvoiceItem(
                     invoice=instance,
                     inventory_item=inventory_item,
                     quantity=required_quantity,
                     sale_value=inventory_item.sale_value,
                     cost_value=inventory_item.cost_value,
-                )
-
-                inventory_item.qty -= required_quantity
-                if inventory_item.qty == 0:
-                    inventory_item.status = "Out of Stock"
-                inventory_item.save()
+                    invoice_created_on=instance.created_on,
+                ))
                 total_price += inventory_item.sale_value * required_quantity
 
+            if removed_item_ids:
+                InvoiceItem.objects.filter(id__in=removed_item_ids).delete()
+            if changed_items:
+                InvoiceItem.objects.bulk_update(changed_items, ['quantity'])
+            if added_items:
+                InvoiceItem.objects.bulk_create(added_items)
+
             instance.total = total_price - instance.discount
             if instance.is_taxable:
                 instance.total = instance.total + ((instance.tax_percentage / 100) * instance.total)
@@ -222,7 +285,8 @@ class InvoiceUpdateSerializer(serializers.ModelSerializer):
                         is_active=True
                     )
 
-            instance.balance = instance.total - instance.advance
+            # The caller holds the invoice row lock, so paid_total includes every committed payment
+            instance.balance = instance.total - instance.advance - instance.paid_total
             if instance.balance < 0:
                 raise ValueError("Invoice Balance calculation Error")
             instance.save()
@@ -234,7 +298,7 @@ class InvoicePaymentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = InvoicePayment
-        fields = '__all__'
+        exclude = ('invoice_created_on',)
         read_only_fields = ('organization',)
 
     def create(self, validated_data):
@@ -242,6 +306,19 @@ class InvoicePaymentSerializer(serializers.ModelSerializer):
                                              created_by=self.context['request'].user)
 
 
+class InvoiceBulkStatusSerializer(serializers.Serializer):
+    """ Target status plus either invoice ids or a filter (start_date, end_date, delivery_date, status). """
+    status = serializers.ChoiceField(choices=list(STATUS_TRANSITIONS))
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False,
+                                max_length=BULK_STATUS_MAX_INVOICES)
+    filter = serializers.DictField(child=serializers.CharField(), required=False)
+
+    def validate(self, data):
+        if ('ids' in data) == ('filter' in data):
+            raise serializers.ValidationError("Provide either ids or filter.")
+        return data
+
+
 class InvoiceItemSerializer(serializers.ModelSerializer):
     class InventorySerializer(serializers.ModelSerializer):
         item_type = serializers.ChoiceField(choices=Inventory.TYPE_CHOICES)
@@ -295,6 +372,12 @@ class InvoiceGetSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = '__all__'
         read_only_fields = ('organization',)
+        select_related = ('customer',)
+        prefetch_related = (
+            'items',
+            'invoice_payment',
+            Prefetch('invoiceitem_set', queryset=InvoiceItem.objects.select_related('inventory_item')),
+        )
 
 
 class InvoiceGetItemSerializer(serializers.ModelSerializer):
@@ -307,3 +390,24 @@ class InvoiceGetItemSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = '__all__'
         read_only_fields = ('organization',)
+        select_related = ('customer', 'prescription')
+        prefetch_related = (
+            'items',
+            'invoice_payment',
+            Prefetch('invoiceitem_set', queryset=InvoiceItem.objects.select_related('inventory_item')),
+        )
+
+
+class InvoiceSyncSerializer(serializers.ModelSerializer):
+    """ Flat invoice for delta sync; customers and prescriptions are synced on their own. """
+    class InvoiceLineSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = InvoiceItem
+            fields = ['inventory_item', 'sale_value', 'cost_value', 'quantity']
+
+    inventory_items = InvoiceLineSerializer(many=True, read_only=True, source='invoiceitem_set')
+
+    class Meta:
+        model = Invoice
+        exclude = ('organization', 'items')
+        prefetch_related = ('invoiceitem_set',)
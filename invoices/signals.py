@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Invoice, InvoiceItem, InvoicePayment
+from .pdf_cache import invoice_pdf_cache
+from .events import publish_invoice_created, publish_invoice_updated, publish_payment_posted, publish_payment_removed
+
+
+def invalidate_invoice_pdfs(invoice_id):
+    if invoice_id:
+        transaction.on_commit(lambda: invoice_pdf_cache.invalidate(invoice_id))
+
+
+@receiver([post_save, post_delete], sender=Invoice)
+def invoice_changed(sender, instance, **kwargs):
+    invalidate_invoice_pdfs(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=InvoiceItem)
+@receiver([post_save, post_delete], sender=InvoicePayment)
+def invoice_line_changed(sender, instance, **kwargs):
+    invalidate_invoice_pdfs(instance.invoice_id)
+
+
+@receiver(post_save, sender=Invoice)
+def publish_invoice_saved(sender, instance, created, **kwargs):
+    if created:
+        publish_invoice_created(instance)
+    else:
+        publish_invoice_updated(instance)
+
+
+@receiver(post_save, sender=InvoicePayment)
+def publish_payment_saved(sender, instance, created, **kwargs):
+    if created and instance.is_active:
+        publish_payment_posted(instance)
+    elif not created and not instance.is_active:
+        publish_payment_removed(instance)
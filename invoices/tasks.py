@@ -0,0 +1,35 @@
+from celery import shared_task
+import base64
+import logging
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from .create_invoice import render_invoice_batch_pdf, PDF_RENDERERS
+from .filters import get_print_run_invoices
+from .invoice_render_model import to_render_model
+from .pdf_cache import invoice_pdf_cache
+
+
+@shared_task
+def render_invoice_batch(organization_id, params, file_name):
+    invoices = [to_render_model(invoice) for invoice in get_print_run_invoices(organization_id, params)]
+    pdf = render_invoice_batch_pdf(invoices)
+    saved_name = default_storage.save(file_name, File(pdf))
+    logging.info(f"Rendered invoice print run {saved_name}")
+    return saved_name
+
+
+@shared_task
+def render_invoice_pdf_copy(invoice, copy_type):
+    """
+    Render one invoice copy on a Celery worker from its (pickled) render model; the PDF
+    travels back base64 encoded.
+    """
+    pdf = PDF_RENDERERS[copy_type](invoice)
+    return base64.b64encode(pdf.getbuffer()).decode()
+
+
+@shared_task
+def evict_invoice_pdf_cache():
+    deleted = invoice_pdf_cache.evict()
+    logging.info(f"Evicted {deleted} cached invoice PDFs")
+    return deleted
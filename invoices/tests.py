@@ -1,3 +1,58 @@
-from django.test import TestCase
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from .invoice_render_model import CustomerRender, InvoiceLineRender, InvoiceRender, OrganizationRender
+from .pdf_render_service import render_pdf
+from .tasks import render_invoice_pdf_copy
 
-# Create your tests here.
+
+def make_render_model():
+    updated_on = timezone.make_aware(datetime(2024, 1, 1))
+    return InvoiceRender(
+        id='1',
+        invoice_number='INV-1',
+        date=date(2024, 1, 1),
+        delivery_date=None,
+        remarks=None,
+        total=Decimal('20.00'),
+        advance=Decimal('5.00'),
+        balance=Decimal('15.00'),
+        updated_on=updated_on,
+        organization=OrganizationRender(
+            id=1, name='Optix', address_first_line='Street 1', country='India', city='Pune',
+            phone_landline=None, post_box_number=None, services=None, updated_on=updated_on,
+        ),
+        customer=CustomerRender(first_name='Asha', last_name='Rao', phone='12345', updated_on=updated_on),
+        prescription=None,
+        lines=(InvoiceLineRender(SKU='F1', name='Frame', description='', item_type='Frames',
+                                 sale_value=Decimal('20.00'), quantity=1),),
+    )
+
+
+class RenderPDFTests(SimpleTestCase):
+
+    def run_pickled(self, args, serializer):
+        # What a worker receives: the arguments after a round trip through the pickle serializer
+        return render_invoice_pdf_copy.apply(pickle.loads(pickle.dumps(args)))
+
+    @override_settings(CELERY_BROKER_URL='amqp://broker', CELERY_RESULT_BACKEND='redis://results')
+    def test_queue_renders_from_the_render_model(self):
+        invoice = make_render_model()
+        with mock.patch.object(render_invoice_pdf_copy, 'apply_async', side_effect=self.run_pickled) as apply_async:
+            pdf = async_to_sync(render_pdf)('organization_copy', invoice)
+        apply_async.assert_called_once_with((invoice, 'organization_copy'), serializer='pickle')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    @override_settings(CELERY_BROKER_URL='amqp://broker', CELERY_RESULT_BACKEND=None)
+    def test_broker_without_result_backend_renders_in_the_pool(self):
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                mock.patch('invoices.pdf_render_service.get_render_executor', return_value=executor), \
+                mock.patch.object(render_invoice_pdf_copy, 'apply_async') as apply_async:
+            pdf = async_to_sync(render_pdf)('customer_copy', make_render_model())
+        apply_async.assert_not_called()
+        self.assertTrue(pdf.startswith(b'%PDF'))
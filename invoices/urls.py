@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework import routers
-from .api import InvoiceViewSet, CreateInvoiceView, InvoicePDFView, InvoicePaymentViewSet, InvoiceCustomerPDFView, GetInvoice
+from .api import InvoiceViewSet, CreateInvoiceView, InvoicePDFView, InvoicePaymentViewSet, InvoiceCustomerPDFView, GetInvoice, InvoiceBatchPDFView, InvoiceBulkStatusView
 
 router = routers.DefaultRouter()
 router.register('api/invoice', InvoiceViewSet, 'invoices')
@@ -11,8 +11,10 @@ urlpatterns = [
     path('api/invoice/get', GetInvoice.as_view(), name='get-invoices'),
 
     path('api/invoice/update/', CreateInvoiceView.as_view(), name='update-invoices'),
+    path('api/invoice/bulk-status/', InvoiceBulkStatusView.as_view(), name='bulk-status-invoices'),
     path('api/invoice/re-calculate/', CreateInvoiceView.as_view(), name='re-calculate-invoices'),
     path('api/invoice/pdf/<uuid:invoice_id>/', InvoicePDFView.as_view(), name='invoice_pdf'),
     path('api/invoice/customer-pdf/<uuid:invoice_id>/', InvoiceCustomerPDFView.as_view(), name='invoice_customer_pdf'),
+    path('api/invoice/pdf/batch/', InvoiceBatchPDFView.as_view(), name='invoice_batch_pdf'),
 
 ] + router.urls
@@ -0,0 +1,72 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from organizations.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def idempotent(handler):
+    """
+    Make a DRF POST handler safe to retry. The first request carrying an Idempotency-Key
+    header runs in one transaction with the key claim and its successful response is
+    stored for the organization; a retry with the same key gets that response back
+    instead of running again. A concurrent retry waits on the key row until the first
+    request finishes. Failed responses are not stored, so the request can be corrected
+    and retried with the same key.
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        organization = request.get_organization()
+        if not key or organization is None:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hashlib.sha256(json.dumps(request.data, cls=JSONEncoder, sort_keys=True).encode()).hexdigest()
+        now = timezone.now()
+        with transaction.atomic():
+            # An expired key that has not been swept yet may be claimed again
+            IdempotencyKey.objects.filter(organization=organization, key=key, expires_on__lte=now).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        organization=organization,
+                        key=key,
+                        request_path=request.path,
+                        request_hash=request_hash,
+                        expires_on=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                    )
+            except IntegrityError:
+                record = None
+
+            if record is not None:
+                response = handler(self, request, *args, **kwargs)
+                if not status.is_success(response.status_code):
+                    # Release the key together with anything the handler wrote
+                    transaction.set_rollback(True)
+                    return response
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+                return response
+
+        record = IdempotencyKey.objects.get(organization=organization, key=key)
+        if record.request_path != request.path or record.request_hash != request_hash:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} has already been used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        response = Response(record.response_body, status=record.response_status)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    return wrapper
@@ -0,0 +1,31 @@
+def apply_query_plan(queryset, serializer_class):
+    """
+    Apply the loading plan a serializer declares on its Meta
+    (`select_related`, `prefetch_related`, `only`) to a queryset.
+    """
+    meta = getattr(serializer_class, 'Meta', None)
+    select_related = getattr(meta, 'select_related', None)
+    prefetch_related = getattr(meta, 'prefetch_related', None)
+    only = getattr(meta, 'only', None)
+
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if only:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class QueryPlanMixin:
+    """
+    Viewset mixin that loads objects with the plan declared by the serializer
+    of the current action, so nested serializers do not query row by row.
+    """
+    query_plan_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.query_plan_actions:
+            queryset = apply_query_plan(queryset, self.get_serializer_class())
+        return queryset
@@ -165,6 +165,38 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'optic_invoicer_api.wsgi.application'
+ASGI_APPLICATION = 'optic_invoicer_api.asgi.application'
+
+# Live invoice events go through Redis when REDIS_URL is set; the in-memory layer only reaches one process
+REDIS_URL = env('REDIS_URL', default=None)
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Shared cache in Redis when REDIS_URL is set, otherwise per-process memory
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
 
 
 # Database
@@ -193,10 +225,57 @@ AWS_SECRET_ACCESS_KEY = env('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = env('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = env('AWS_S3_REGION_NAME', default="ap-south-1")
 
-# CELERY_BROKER_URL = env('STACKHERO_RABBITMQ_AMQP_URL_TLS', None)
+# Background jobs (print runs, PDF renders, beat schedule) need a broker and the Procfile worker;
+# without one, print runs and PDF renders happen in the web process
+CELERY_BROKER_URL = env('STACKHERO_RABBITMQ_AMQP_URL_TLS', default=None)
+# Invoice PDFs rendered on the queue come back through the result backend (Redis when REDIS_URL is set)
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default=REDIS_URL)
+# Render models are sent to the PDF task pickled; every other task uses JSON
+CELERY_ACCEPT_CONTENT = ['json', 'pickle']
 # Tell Django to use S3 for file storage
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Rendered invoice PDF cache: "disk" (INVOICE_PDF_CACHE_DIR) or "storage" (DEFAULT_FILE_STORAGE)
+INVOICE_PDF_CACHE_BACKEND = env('INVOICE_PDF_CACHE_BACKEND', default='disk')
+INVOICE_PDF_CACHE_DIR = env('INVOICE_PDF_CACHE_DIR', default=os.path.join(BASE_DIR, 'pdf_cache'))
+INVOICE_PDF_CACHE_MAX_BYTES = env.int('INVOICE_PDF_CACHE_MAX_BYTES', default=256 * 1024 * 1024)
+
+# Invoice PDFs render in a pool of worker processes, or on the Celery queue when both
+# CELERY_BROKER_URL and CELERY_RESULT_BACKEND are set
+INVOICE_PDF_RENDER_WORKERS = env.int('INVOICE_PDF_RENDER_WORKERS', default=2)
+INVOICE_PDF_RENDER_TIMEOUT = env.int('INVOICE_PDF_RENDER_TIMEOUT', default=30)
+
+# How long a stored Idempotency-Key response is replayed before the key can be reused
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+
+# Dashboard reports are cached in this CACHES alias until the organization's data changes.
+# A cache shared by all processes (e.g. Redis through REDIS_URL) is always used. Per-process memory
+# is only used with REPORT_CACHE_PROCESS_LOCAL (tests, single-process servers), since a change
+# invalidated in one process would stay cached in the others
+REPORT_CACHE_ALIAS = env('REPORT_CACHE_ALIAS', default='default')
+REPORT_CACHE_PROCESS_LOCAL = env.bool('REPORT_CACHE_PROCESS_LOCAL', default=False)
+REPORT_CACHE_TIMEOUT = env.int('REPORT_CACHE_TIMEOUT', default=60 * 60)
+
+# Invoice/inventory create entitlement: kept this long in the shared cache, and in each process's memory
+SUBSCRIPTION_ENTITLEMENT_CACHE_TIMEOUT = env.int('SUBSCRIPTION_ENTITLEMENT_CACHE_TIMEOUT', default=5 * 60)
+SUBSCRIPTION_ENTITLEMENT_LOCAL_TTL = env.int('SUBSCRIPTION_ENTITLEMENT_LOCAL_TTL', default=30)
+
+# Periodic jobs run by `celery -A optic_invoicer_api beat`
+CELERY_BEAT_SCHEDULE = {
+    'refresh-organization-statistics': {
+        'task': 'organizations.tasks.refresh_organization_statistics',
+        'schedule': env.int('ORGANIZATION_STATISTICS_REFRESH_SECONDS', default=15 * 60),
+    },
+    'sweep-idempotency-keys': {
+        'task': 'organizations.tasks.sweep_idempotency_keys',
+        'schedule': env.int('IDEMPOTENCY_KEY_SWEEP_SECONDS', default=60 * 60),
+    },
+    'evict-invoice-pdf-cache': {
+        'task': 'invoices.tasks.evict_invoice_pdf_cache',
+        'schedule': env.int('INVOICE_PDF_CACHE_EVICT_SECONDS', default=60 * 60),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,10 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Backends whose entries live in one process, so a change invalidated in one process stays cached in the others
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared_cache(cache):
+    """ Whether every server process reads and invalidates the same entries of `cache`. """
+    return not isinstance(cache, PROCESS_LOCAL_BACKENDS)
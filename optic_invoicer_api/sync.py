@@ -0,0 +1,86 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from customers.models import Customer, Prescription
+from customers.serializers import CustomerSerializer, PrescriptionGetSerializer
+from inventory.models import Inventory
+from inventory.serializers import InventorySerializer
+from invoices.models import Invoice
+from invoices.serializers import InvoiceSyncSerializer
+from .query_plan import apply_query_plan
+
+# Response key -> (model, serializer) of everything a POS client keeps locally
+SYNC_SOURCES = {
+    "invoices": (Invoice, InvoiceSyncSerializer),
+    "customers": (Customer, CustomerSerializer),
+    "prescriptions": (Prescription, PrescriptionGetSerializer),
+    "inventory": (Inventory, InventorySerializer),
+}
+SYNC_PAGE_SIZE = 500
+# Rows touched in the last few seconds are left for the next sync, so a transaction that
+# is still open cannot commit a row behind a cursor that has already moved past it
+SYNC_SETTLE_SECONDS = 5
+
+
+def encode_sync_token(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_sync_token(token):
+    """ {source: (updated_on, id)} from a token; an empty token starts from the beginning. """
+    if not token:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {
+            source: (datetime.fromisoformat(positions[source][0]), positions[source][1])
+            for source in SYNC_SOURCES if source in positions
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, IndexError):
+        raise ValueError("Invalid sync token.")
+
+
+class SyncView(APIView):
+    """
+    Delta sync: every invoice, customer, prescription and inventory row of the organization
+    created, updated or deactivated since the `since` token, oldest first. Deactivated rows
+    come back with is_active false. Keep calling with the returned `next` token while
+    `has_more` is true.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        organization = request.get_organization()
+        positions = decode_sync_token(request.query_params.get('since'))
+        settled_before = timezone.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+        data = {}
+        has_more = False
+        next_positions = {
+            source: (updated_on.isoformat(), pk) for source, (updated_on, pk) in positions.items()
+        }
+        for source, (model, serializer_class) in SYNC_SOURCES.items():
+            queryset = model.objects.filter(organization=organization, updated_on__lt=settled_before)
+            if source in positions:
+                updated_on, pk = positions[source]
+                queryset = queryset.filter(Q(updated_on__gt=updated_on) | Q(updated_on=updated_on, pk__gt=pk))
+            queryset = apply_query_plan(queryset, serializer_class).order_by('updated_on', 'pk')
+            rows = list(queryset[:SYNC_PAGE_SIZE + 1])
+            if len(rows) > SYNC_PAGE_SIZE:
+                has_more = True
+                rows = rows[:SYNC_PAGE_SIZE]
+            if rows:
+                next_positions[source] = (rows[-1].updated_on.isoformat(), str(rows[-1].pk))
+            data[source] = serializer_class(rows, many=True, context={'request': request}).data
+
+        return Response({
+            "next": encode_sync_token(next_positions),
+            "has_more": has_more,
+            **data
+        })
@@ -4,6 +4,7 @@ from django.urls import path, include
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
+from .sync import SyncView
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -23,6 +24,7 @@ urlpatterns = [
     path("", include('invoices.urls')),
     path("",  include('staff.urls')),
     path("",  include('wholesale.urls')),
+    path('api/sync', SyncView.as_view(), name='sync'),
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0),name='schema-swagger-ui'),
 
 ]
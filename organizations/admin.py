@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Organization, Subscription, Payment
+from .models import Organization, Subscription, Payment, DocumentSequence, IdempotencyKey, DailyOrgMetrics
 # Register your models here.
 admin.site.register(Organization)
 admin.site.register(Subscription)
 admin.site.register(Payment)
+admin.site.register(DocumentSequence)
+admin.site.register(IdempotencyKey)
+admin.site.register(DailyOrgMetrics)
@@ -3,7 +3,11 @@ import datetime
 from django.contrib.auth.models import User
 from rest_framework.response import Response
 from django.conf import settings
-from .models import Organization, Subscription
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Organization, Subscription, Payment
+from staff.models import Staff
+from optic_invoicer_api.custom_cursor_pagination import CustomCursorPagination
 from rest_framework.views import APIView
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
@@ -24,6 +28,9 @@ from .utils import (
     convert_date_request_to_start_end_dates,
     date_request_dict
 )
+from .metrics import REPORT_METRICS, monthly_metrics, monthly_statistics
+from .report_cache import report_cache_key, get_cached_report, set_cached_report
+from .statistics import refresh_statistics_batch, refresh_bounds
 
 
 class OrganizationViewSet(viewsets.ModelViewSet):
@@ -45,9 +52,16 @@ class GetOrganizationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        organization = Organization.objects.filter(id=request.get_organization().id).first()
+        organization_id = request.get_organization().id
+        cache_key = report_cache_key(organization_id, "organization")
+        data = get_cached_report(cache_key)
+        if data is not None:
+            return Response(data)
+
+        organization = Organization.objects.filter(id=organization_id).first()
         if organization:
             serializer = OrganizationSerializer(organization)
+            set_cached_report(cache_key, serializer.data)
             return Response(serializer.data)
         return Response({'detail': 'Organization not found for the user.'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -64,18 +78,64 @@ class CreateOrganizationAndStaffView(APIView):
 
 
 class OrganizationListView(APIView):
+    """
+    All organizations for superusers, newest first and cursor paginated, filtered by
+    `is_active` and by `subscription_status` (status of the latest subscription).
+    """
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        latest_subscription = Subscription.objects.filter(organization=OuterRef('pk')).order_by('-created_on', '-id')
+        latest_payment = Payment.objects.filter(
+            subscription_payments=OuterRef('latest_subscription_id')
+        ).order_by('-created_on', '-id')
+        superstaff = Staff.objects.filter(organization=OuterRef('pk'), staff_superuser=True)
+        staff_count = Staff.objects.filter(organization=OuterRef('pk')).order_by().values('organization').annotate(
+            count=Count('id')
+        ).values('count')
+
+        # One query for the whole page: every per-organization figure is a correlated subquery
+        queryset = Organization.objects.only(
+            'id', 'name', 'is_active', 'email', 'primary_phone_mobile', 'created_on'
+        ).annotate(
+            staff_count=Coalesce(Subquery(staff_count), 0),
+            superstaff_first_name=Subquery(superstaff.values('first_name')[:1]),
+            latest_subscription_id=Subquery(latest_subscription.values('id')[:1]),
+            latest_subscription_status=Subquery(latest_subscription.values('status')[:1]),
+        ).annotate(
+            latest_payment_amount=Subquery(latest_payment.values('amount')[:1]),
+            latest_payment_created_on=Subquery(latest_payment.values('created_on')[:1]),
+        )
+
+        is_active = self.request.query_params.get('is_active')
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active.lower() in ['true', '1', 'yes'])
+        subscription_status = self.request.query_params.get('subscription_status')
+        if subscription_status:
+            queryset = queryset.filter(latest_subscription_status=subscription_status)
+        return queryset
+
     def get(self, request):
         if not self.request.user.is_superuser:
             return Response({'detail': 'Only superusers can view organizations.'}, status=status.HTTP_403_FORBIDDEN)
 
-        organizations = Organization.objects.all()
-        serializer = ListOrganizationStaffSerializer(organizations, many=True)
+        queryset = self.get_queryset()
+        paginator = CustomCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+
+        if page is not None:
+            serializer = ListOrganizationStaffSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = ListOrganizationStaffSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
 class RefreshOrganizationData(APIView):
+    """
+    The organization with its statistics, which the refresh_organization_statistics job keeps
+    up to date in the background. Only an organization the job has not reached yet is refreshed here.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
@@ -83,20 +143,8 @@ class RefreshOrganizationData(APIView):
         if not organization:
             return Response({'detail': 'User is not associated with any organization.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        end_date = datetime.date.today()
-        start_date = end_date - datetime.timedelta(days=5 * 30)
-        report_data = compute_reports(organization, start_date, end_date)
-
-        # Update organization statistics
-        organization.invoice_statistics = report_data.get("invoice_statistics")
-        organization.inventory_statistics = report_data.get("inventory_statistics")
-        organization.prescription_statistics = report_data.get("prescription_statistics")
-        organization.customer_statistics = report_data.get("customer_statistics")
-        organization.total_inventory = report_data.get("total_inventory")
-        organization.total_invoices = report_data.get("total_invoices")
-        organization.total_customers = report_data.get("total_customers")
-        organization.total_prescriptions = report_data.get("total_prescriptions")
-        organization.save()
+        if organization.statistics_refreshed_on is None:
+            refresh_statistics_batch([organization], *refresh_bounds())
 
         serializer = OrganizationSerializer(organization)
         return Response(serializer.data)
@@ -133,19 +181,31 @@ class ModelReportsOrganizationData(APIView):
             report_end_date = datetime.date.today()
             get_all = False
 
-        report_queryset = compute_statistics(model_object, organization, report_start_date, report_end_date, False)
-        total_count = model_object.objects.filter(
-            organization=organization.id
-        )
-        if not get_all and report_start_date and report_end_date:
-            total_count = total_count.filter(created_on__range=(report_start_date, report_end_date))
+        if model_object in REPORT_METRICS:
+            # Invoices, inventory, customers and prescriptions are read from the daily rollup
+            cache_key = report_cache_key(organization.id, f"model_{model}", report_start_date, report_end_date)
+            data = get_cached_report(cache_key)
+            if data is not None:
+                return Response(data)
+            count_field, value_field = REPORT_METRICS[model_object]
+            fields = [count_field, value_field] if value_field else [count_field]
+            rows = monthly_metrics(organization, report_start_date, report_end_date, fields)
+            report_list = [{'value': 0.0, **stat} for stat in monthly_statistics(rows, count_field, value_field)]
+            total_count = sum(stat['count'] for stat in report_list)
+        else:
+            report_queryset = compute_statistics(model_object, organization, report_start_date, report_end_date, get_all)
+            total_count = model_object.objects.filter(
+                organization=organization.id
+            )
+            if not get_all and report_start_date and report_end_date:
+                total_count = total_count.filter(created_on__range=(report_start_date, report_end_date))
 
-        total_count = total_count.count()
+            total_count = total_count.count()
 
-        report_list = [
-            {'year': stat['year'], 'month': stat['month'], 'count': stat['count'], 'value': float(stat.get('value', 0))}
-            for stat in report_queryset
-        ]
+            report_list = [
+                {'year': stat['year'], 'month': stat['month'], 'count': stat['count'], 'value': float(stat.get('value') or 0)}
+                for stat in report_queryset
+            ]
 
         report_data = {
             "monthly_statistics": report_list,
@@ -157,6 +217,8 @@ class ModelReportsOrganizationData(APIView):
         serializer = ModelReportDataSerializer(data=report_data)
 
         if serializer.is_valid():
+            if model_object in REPORT_METRICS:
+                set_cached_report(cache_key, serializer.data)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -186,12 +248,18 @@ class ReportsOrganizationData(APIView):
             report_end_date = datetime.date.today()
             get_all = False
 
+        cache_key = report_cache_key(organization.id, "report", report_start_date, report_end_date)
+        data = get_cached_report(cache_key)
+        if data is not None:
+            return Response(data)
+
         report_data = compute_reports(organization, report_start_date, report_end_date, get_all)
         report_data['start_date'] = report_start_date
         report_data['end_date'] = report_end_date
         serializer = ReportDataSerializer(data=report_data)
 
         if serializer.is_valid():
+            set_cached_report(cache_key, serializer.data)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -0,0 +1,136 @@
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from optic_invoicer_api.shared_cache import is_shared_cache
+from .models import Subscription
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class InvoiceEntitlement:
+    """ Whether an organization may create invoices and inventory, and until when that answer holds. """
+    can_create: bool
+    subscription_type: Optional[str]
+    # Unix timestamp at which the trial window starts or ends, None when nothing will change it
+    expires_at: Optional[float]
+
+
+# Organization id -> (entitlement, time.time() after which this process asks the shared cache again),
+# least recently used first and bounded to LOCAL_ENTITLEMENTS_MAX organizations
+_local_entitlements = OrderedDict()
+_local_lock = threading.Lock()
+LOCAL_ENTITLEMENTS_MAX = 1024
+
+
+def entitlement_key(organization_id):
+    return f"invoice_entitlement:{organization_id}"
+
+
+def day_start(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def get_local_entitlement(organization_id, now):
+    with _local_lock:
+        local = _local_entitlements.get(organization_id)
+        if local is None:
+            return None
+        if now >= local[1]:
+            del _local_entitlements[organization_id]
+            return None
+        _local_entitlements.move_to_end(organization_id)
+        return local[0]
+
+
+def set_local_entitlement(organization_id, entitlement, expiry):
+    with _local_lock:
+        _local_entitlements[organization_id] = (entitlement, expiry)
+        _local_entitlements.move_to_end(organization_id)
+        while len(_local_entitlements) > LOCAL_ENTITLEMENTS_MAX:
+            _local_entitlements.popitem(last=False)
+
+
+def compute_invoice_entitlement(organization_id):
+    """ Entitlement from the latest active subscription's trial window, counted in whole days. """
+    subscription = Subscription.objects.filter(
+        organization_id=organization_id,
+        is_active=True
+    ).order_by('-created_on').only('subscription_type', 'trial_start_date', 'trial_end_date').first()
+    if not subscription:
+        return InvoiceEntitlement(False, None, None)
+
+    today = timezone.now().date()
+    if subscription.trial_start_date and subscription.trial_end_date:
+        trial_start_date = subscription.trial_start_date.date()
+        trial_end_date = subscription.trial_end_date.date()
+        if today < trial_start_date:
+            return InvoiceEntitlement(False, subscription.subscription_type, day_start(trial_start_date))
+        if today <= trial_end_date:
+            return InvoiceEntitlement(
+                True, subscription.subscription_type, day_start(trial_end_date + datetime.timedelta(days=1))
+            )
+    return InvoiceEntitlement(False, subscription.subscription_type, None)
+
+
+def get_invoice_entitlement(organization_id):
+    """
+    The organization's InvoiceEntitlement: from this process's memory for up to
+    SUBSCRIPTION_ENTITLEMENT_LOCAL_TTL seconds, then from the shared cache, computed on a miss.
+    Entries never outlive the trial boundary they were computed against. A process-local
+    default cache is not used, as invalidations would not reach the other processes.
+    """
+    now = time.time()
+    entitlement = get_local_entitlement(organization_id, now)
+    if entitlement is not None:
+        return entitlement
+
+    key = entitlement_key(organization_id)
+    use_cache = is_shared_cache(cache)
+    entitlement = None
+    if use_cache:
+        try:
+            entitlement = cache.get(key)
+        except Exception as e:
+            logger.error('Entitlement cache read failed for organization %s: %s', organization_id, e)
+    if entitlement is None or (entitlement.expires_at is not None and entitlement.expires_at <= now):
+        entitlement = compute_invoice_entitlement(organization_id)
+        timeout = settings.SUBSCRIPTION_ENTITLEMENT_CACHE_TIMEOUT
+        if entitlement.expires_at is not None:
+            timeout = max(1, min(timeout, int(entitlement.expires_at - now)))
+        if use_cache:
+            try:
+                cache.set(key, entitlement, timeout)
+            except Exception as e:
+                logger.error('Entitlement cache write failed for organization %s: %s', organization_id, e)
+
+    local_expiry = now + settings.SUBSCRIPTION_ENTITLEMENT_LOCAL_TTL
+    if entitlement.expires_at is not None:
+        local_expiry = min(local_expiry, entitlement.expires_at)
+    set_local_entitlement(organization_id, entitlement, local_expiry)
+    return entitlement
+
+
+def invalidate_invoice_entitlement(organization_id):
+    """ Drop the cached entitlement; other processes let theirs go within the local TTL. """
+    with _local_lock:
+        _local_entitlements.pop(organization_id, None)
+    if not is_shared_cache(cache):
+        return
+    try:
+        cache.delete(entitlement_key(organization_id))
+    except Exception as e:
+        logger.error('Entitlement cache invalidation failed for organization %s: %s', organization_id, e)
+
+
+def invalidate_invoice_entitlement_on_commit(organization_id):
+    if organization_id:
+        transaction.on_commit(lambda: invalidate_invoice_entitlement(organization_id))
@@ -0,0 +1,34 @@
+import argparse
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from organizations.models import Organization
+from organizations.metrics import rebuild_daily_metrics
+
+
+def parse_day(value):
+    day = parse_date(value)
+    if not day:
+        raise argparse.ArgumentTypeError("expected YYYY-MM-DD")
+    return day
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the DailyOrgMetrics rollup from the invoice, payment, customer, prescription and inventory rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, action='append', help='Organization id (repeatable, defaults to all)')
+        parser.add_argument('--since', type=parse_day, help='First day to rebuild, YYYY-MM-DD (defaults to the first one)')
+        parser.add_argument('--until', type=parse_day, help='Last day to rebuild, YYYY-MM-DD (defaults to the last one)')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.order_by('id')
+        if options['organization']:
+            organizations = organizations.filter(id__in=options['organization'])
+
+        total_days = 0
+        for organization_id in organizations.values_list('id', flat=True):
+            days = rebuild_daily_metrics(organization_id, options['since'], options['until'])
+            total_days += days
+            self.stdout.write(f'Organization {organization_id}: {days} days')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily metrics: {total_days} days'))
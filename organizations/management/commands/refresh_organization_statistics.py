@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from organizations.statistics import refresh_organization_statistics
+
+
+class Command(BaseCommand):
+    help = 'Refresh the statistics stored on active organizations from the daily metrics (schedule it, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Organizations read and written per batch')
+
+    def handle(self, *args, **options):
+        updated = refresh_organization_statistics(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed statistics of {updated} organizations'))
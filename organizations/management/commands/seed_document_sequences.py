@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import ExtractYear
+from organizations.models import DocumentSequence
+from invoices.models import Invoice
+from wholesale.models import WholeSaleOrder
+
+
+class Command(BaseCommand):
+    help = 'Seed invoice and wholesale order number sequences from existing data'
+
+    # document type -> (model, number field, number prefix before the organization prefix)
+    DOCUMENT_SOURCES = {
+        "Invoice": (Invoice, "invoice_number", ""),
+        "WholeSaleOrder": (WholeSaleOrder, "order_no", "WSO"),
+    }
+
+    def handle(self, *args, **kwargs):
+        existing = {
+            (sequence.organization_id, sequence.document_type, sequence.year, sequence.is_taxable): sequence.last_value
+            for sequence in DocumentSequence.objects.all()
+        }
+        sequences = []
+
+        for document_type, (model, number_field, document_prefix) in self.DOCUMENT_SOURCES.items():
+            groups = model.objects.annotate(year=ExtractYear('created_on')).values(
+                'organization_id', 'organization__name', 'year', 'is_taxable'
+            ).annotate(count=Count('pk'), last_number=Max(number_field)).order_by()
+
+            for group in groups:
+                key = (group['organization_id'], document_type, group['year'], group['is_taxable'])
+                prefix = f"{document_prefix}{group['organization__name'][:4].upper()}"
+                if not group['is_taxable']:
+                    prefix = f"{prefix}NT"
+                last_value = max(
+                    group['count'],
+                    self.parse_number(group['last_number'], f"{prefix}{group['year']}"),
+                    existing.get(key, 0)
+                )
+                sequences.append(DocumentSequence(
+                    organization_id=group['organization_id'],
+                    document_type=document_type,
+                    year=group['year'],
+                    is_taxable=group['is_taxable'],
+                    last_value=last_value
+                ))
+                self.stdout.write(f'{document_type} {prefix}{group["year"]}: next number {last_value + 1}')
+
+        with transaction.atomic():
+            DocumentSequence.objects.bulk_create(
+                sequences,
+                update_conflicts=True,
+                unique_fields=['organization', 'document_type', 'year', 'is_taxable'],
+                update_fields=['last_value']
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Seeded {len(sequences)} document sequences'))
+
+    @staticmethod
+    def parse_number(number, head):
+        """ Return the running counter of a generated number, or 0 if it does not follow the format. """
+        if not number or not number.startswith(head):
+            return 0
+        counter = number[len(head):]
+        return int(counter) if counter.isdigit() else 0
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from organizations.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key responses'
+
+    def handle(self, *args, **kwargs):
+        deleted = IdempotencyKey.sweep()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,219 @@
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, TruncDate
+from django.utils import timezone
+from customers.models import Customer, Prescription
+from inventory.models import Inventory
+from invoices.models import Invoice, InvoicePayment
+from .models import DailyOrgMetrics
+from .report_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal(0), output_field=MONEY)
+
+
+def money_sum(expression, **filters):
+    return Coalesce(Sum(expression, filter=Q(**filters) if filters else None, output_field=MONEY), ZERO)
+
+
+tax_percentage = Coalesce(F('tax_percentage'), ZERO)
+
+# Source name -> (model, DailyOrgMetrics field -> aggregate over the source rows created that day)
+METRIC_SOURCES = {
+    "invoices": (Invoice, {
+        'invoice_count': Count('id'),
+        'invoice_total': money_sum('total'),
+        # Totals include tax, so the tax share of a total is tax / (100 + tax)
+        'tax_total': money_sum(F('total') * tax_percentage / (tax_percentage + Value(Decimal(100))), is_taxable=True),
+        'discount_total': money_sum('discount'),
+    }),
+    "payments": (InvoicePayment, {
+        'cash_payments': money_sum('amount', is_active=True, payment_mode="Cash"),
+        'card_payments': money_sum('amount', is_active=True, payment_mode="Card"),
+        'online_payments': money_sum('amount', is_active=True, payment_mode="Online"),
+        'other_payments': money_sum('amount', is_active=True, payment_mode="Others"),
+    }),
+    "customers": (Customer, {'new_customers': Count('id')}),
+    "prescriptions": (Prescription, {'new_prescriptions': Count('id')}),
+    "inventory": (Inventory, {'new_inventory': Count('id'), 'inventory_value': money_sum('sale_value')}),
+}
+SOURCE_BY_MODEL = {model: source for source, (model, _) in METRIC_SOURCES.items()}
+
+# Report model -> (count field, value field) of its monthly statistics
+REPORT_METRICS = {
+    Invoice: ('invoice_count', 'invoice_total'),
+    Inventory: ('new_inventory', 'inventory_value'),
+    Customer: ('new_customers', None),
+    Prescription: ('new_prescriptions', None),
+}
+
+
+def source_fields(sources):
+    return [field for source in sources for field in METRIC_SOURCES[source][1]]
+
+
+def compute_daily_metrics(organization_id, start=None, end=None, sources=METRIC_SOURCES):
+    """ {day: {field: value}} of an organization from the raw rows, one grouped query per source. """
+    days = {}
+    for source in sources:
+        model, aggregates = METRIC_SOURCES[source]
+        queryset = model.objects.filter(organization_id=organization_id)
+        if start:
+            queryset = queryset.filter(created_on__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        if end:
+            queryset = queryset.filter(created_on__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+        rows = queryset.annotate(day=TruncDate('created_on')).values('day').annotate(**aggregates).order_by()
+        for row in rows:
+            days.setdefault(row.pop('day'), {}).update(row)
+    return days
+
+
+def store_daily_metrics(organization_id, days, fields):
+    """ Upsert the given fields of {day: {field: value}}, leaving the other fields of existing rows alone. """
+    DailyOrgMetrics.objects.bulk_create(
+        [DailyOrgMetrics(organization_id=organization_id, date=day, **values) for day, values in days.items()],
+        update_conflicts=True,
+        unique_fields=['organization', 'date'],
+        update_fields=fields + ['updated_on'],
+        batch_size=500,
+    )
+
+
+def refresh_daily_metrics(organization_id, day, sources):
+    """
+    Recompute the sources' figures of one day with its row locked. Refreshes of the same day
+    run one after the other and each reads the source rows once it holds the lock, so the last
+    one to write has seen every commit that scheduled a refresh.
+    """
+    fields = source_fields(sources)
+    with transaction.atomic():
+        DailyOrgMetrics.objects.bulk_create(
+            [DailyOrgMetrics(organization_id=organization_id, date=day)], ignore_conflicts=True
+        )
+        daily_metrics = DailyOrgMetrics.objects.select_for_update().get(organization_id=organization_id, date=day)
+        values = dict.fromkeys(fields, 0)
+        values.update(compute_daily_metrics(organization_id, day, day, sources).get(day, {}))
+        for field, value in values.items():
+            setattr(daily_metrics, field, value)
+        daily_metrics.save(update_fields=fields + ['updated_on'])
+
+
+def refresh_organization_days(days):
+    """ Refresh {(organization id, day): sources}, then retire the organizations' cached reports. """
+    for (organization_id, day), sources in days.items():
+        try:
+            refresh_daily_metrics(organization_id, day, sources)
+        except Exception as e:
+            logger.error('Daily metrics refresh failed for organization %s on %s: %s', organization_id, day, e)
+    # Reports read the rollup, so their cached copies are retired once it is up to date
+    for organization_id in {organization_id for organization_id, _ in days}:
+        bump_data_version(organization_id)
+
+
+def rebuild_daily_metrics(organization_id, start=None, end=None):
+    """ Recompute every DailyOrgMetrics row of an organization in the date range from the raw rows. """
+    with transaction.atomic():
+        existing = DailyOrgMetrics.objects.filter(organization_id=organization_id)
+        if start:
+            existing = existing.filter(date__gte=start)
+        if end:
+            existing = existing.filter(date__lte=end)
+        existing.delete()
+        days = compute_daily_metrics(organization_id, start, end)
+        fields = source_fields(METRIC_SOURCES)
+        store_daily_metrics(organization_id, {day: {**dict.fromkeys(fields, 0), **values} for day, values in days.items()}, fields)
+    return len(days)
+
+
+_pending = threading.local()
+
+
+def schedule_daily_metrics_refresh(organization_id, created_on, source):
+    """
+    Recompute the source's figures for the day `created_on` falls on once the current
+    transaction commits. Days touched several times in a transaction are recomputed once.
+    """
+    if not organization_id or not created_on:
+        return
+    pending = getattr(_pending, 'days', None)
+    if pending is None:
+        pending = _pending.days = {}
+    pending.setdefault((organization_id, timezone.localdate(created_on)), set()).add(source)
+    transaction.on_commit(flush_daily_metrics)
+
+
+def flush_daily_metrics():
+    # Days left over from a rolled back transaction are simply recomputed along with these
+    pending = getattr(_pending, 'days', None)
+    if not pending:
+        return
+    _pending.days = {}
+    if getattr(settings, 'CELERY_BROKER_URL', None):
+        # Keep the aggregate queries off the request: a worker refreshes the days
+        from .tasks import refresh_daily_metrics as refresh_task
+        try:
+            refresh_task.delay([
+                [organization_id, day.isoformat(), sorted(sources)] for (organization_id, day), sources in pending.items()
+            ])
+            return
+        except Exception as e:
+            logger.error('Queueing the daily metrics refresh failed, refreshing in process: %s', e)
+    refresh_organization_days(pending)
+
+
+def monthly_metrics(organization, start_date=None, end_date=None, fields=None):
+    """ DailyOrgMetrics of an organization summed by year and month, oldest first. """
+    fields = fields or source_fields(METRIC_SOURCES)
+    queryset = DailyOrgMetrics.objects.filter(organization=organization)
+    if start_date and end_date:
+        queryset = queryset.filter(date__range=(start_date, end_date))
+    return queryset.annotate(year=ExtractYear('date'), month=ExtractMonth('date')).values('year', 'month').annotate(
+        **{field: Sum(field) for field in fields}
+    ).order_by('year', 'month')
+
+
+def report_metrics(organization, start_date=None, end_date=None):
+    """
+    Monthly sums of every rollup field within the date range plus all-time totals of the
+    new-row counts, in a single query: every month is grouped once and the range is applied
+    as an aggregate filter, so months outside it only feed the totals.
+    """
+    in_range = Q(date__range=(start_date, end_date)) if start_date and end_date else None
+    fields = source_fields(METRIC_SOURCES)
+    count_fields = [count_field for count_field, _ in REPORT_METRICS.values()]
+    months = (
+        DailyOrgMetrics.objects.filter(organization=organization)
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date')).values('year', 'month')
+        .annotate(
+            **{f"range_{field}": Sum(field, filter=in_range) for field in fields},
+            **{f"all_{field}": Sum(field) for field in count_fields},
+        )
+        .order_by('year', 'month')
+    )
+    rows = []
+    totals = dict.fromkeys(count_fields, 0)
+    for month in months:
+        rows.append({'year': month['year'], 'month': month['month'], **{field: month[f"range_{field}"] for field in fields}})
+        for field in count_fields:
+            totals[field] += month[f"all_{field}"]
+    return rows, totals
+
+
+def monthly_statistics(rows, count_field, value_field=None):
+    """ Report entries of one model out of monthly_metrics rows, skipping months it had nothing in. """
+    statistics = []
+    for row in rows:
+        if not row[count_field]:
+            continue
+        stat = {'year': row['year'], 'month': row['month'], 'count': row[count_field]}
+        if value_field:
+            stat['value'] = float(row[value_field])
+        statistics.append(stat)
+    return statistics
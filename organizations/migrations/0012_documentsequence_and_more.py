@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 08:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0011_organization_is_retail_organization_is_wholesale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('Invoice', 'Invoice'), ('WholeSaleOrder', 'WholeSaleOrder')], max_length=20)),
+                ('year', models.PositiveIntegerField()),
+                ('is_taxable', models.BooleanField(default=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='organizations.organization')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='documentsequence',
+            constraint=models.UniqueConstraint(fields=('organization', 'document_type', 'year', 'is_taxable'), name='unique_document_sequence'),
+        ),
+    ]
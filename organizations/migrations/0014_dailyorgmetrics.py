@@ -0,0 +1,90 @@
+# Generated by Django 4.2 on 2026-10-18 09:11
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+import django.db.models.deletion
+
+MONEY = models.DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal(0), output_field=MONEY)
+
+
+def money_sum(expression, **filters):
+    return Coalesce(Sum(expression, filter=Q(**filters) if filters else None, output_field=MONEY), ZERO)
+
+
+def backfill_daily_metrics(apps, schema_editor):
+    """ Build the rollup of every organization from the existing rows, one grouped query per source. """
+    DailyOrgMetrics = apps.get_model('organizations', 'DailyOrgMetrics')
+    tax_percentage = Coalesce(F('tax_percentage'), ZERO)
+    sources = [
+        (apps.get_model('invoices', 'Invoice'), {
+            'invoice_count': Count('id'),
+            'invoice_total': money_sum('total'),
+            'tax_total': money_sum(F('total') * tax_percentage / (tax_percentage + Value(Decimal(100))), is_taxable=True),
+            'discount_total': money_sum('discount'),
+        }),
+        (apps.get_model('invoices', 'InvoicePayment'), {
+            'cash_payments': money_sum('amount', is_active=True, payment_mode="Cash"),
+            'card_payments': money_sum('amount', is_active=True, payment_mode="Card"),
+            'online_payments': money_sum('amount', is_active=True, payment_mode="Online"),
+            'other_payments': money_sum('amount', is_active=True, payment_mode="Others"),
+        }),
+        (apps.get_model('customers', 'Customer'), {'new_customers': Count('id')}),
+        (apps.get_model('customers', 'Prescription'), {'new_prescriptions': Count('id')}),
+        (apps.get_model('inventory', 'Inventory'), {'new_inventory': Count('id'), 'inventory_value': money_sum('sale_value')}),
+    ]
+    days = {}
+    for model, aggregates in sources:
+        rows = model.objects.annotate(day=TruncDate('created_on')).values(
+            'organization_id', 'day'
+        ).annotate(**aggregates).order_by()
+        for row in rows:
+            days.setdefault((row.pop('organization_id'), row.pop('day')), {}).update(row)
+    DailyOrgMetrics.objects.bulk_create(
+        [
+            DailyOrgMetrics(organization_id=organization_id, date=day, **values)
+            for (organization_id, day), values in days.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0013_idempotencykey'),
+        ('invoices', '0017_organization_created_on_index'),
+        ('customers', '0011_organization_created_on_index'),
+        ('inventory', '0009_organization_created_on_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrgMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('invoice_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('card_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('online_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('other_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_customers', models.PositiveIntegerField(default=0)),
+                ('new_prescriptions', models.PositiveIntegerField(default=0)),
+                ('new_inventory', models.PositiveIntegerField(default=0)),
+                ('inventory_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='organizations.organization')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyorgmetrics',
+            constraint=models.UniqueConstraint(fields=('organization', 'date'), name='unique_daily_org_metrics'),
+        ),
+        migrations.RunPython(backfill_daily_metrics, migrations.RunPython.noop),
+    ]
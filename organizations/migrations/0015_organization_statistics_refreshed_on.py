@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0014_dailyorgmetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='statistics_refreshed_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, connection
+from django.utils import timezone
 
 
 class Organization(models.Model):
@@ -27,6 +29,8 @@ class Organization(models.Model):
     prescription_statistics =  models.JSONField(default=list, blank=True, null=True)
     inventory_statistics =  models.JSONField(default=list, blank=True, null=True)
     invoice_statistics =  models.JSONField(default=list, blank=True, null=True)
+    # When the refresh_organization_statistics job last brought the statistics above up to date
+    statistics_refreshed_on = models.DateTimeField(null=True, blank=True)
 
 
     # Default fields
@@ -99,4 +103,102 @@ class Subscription(models.Model):
                 id=self.id  # Exclude the current subscription if it's already in the database
             ).update(is_active=False)
 
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class DocumentSequence(models.Model):
+    DOCUMENT_TYPE_CHOICES = [
+        ("Invoice", "Invoice"),
+        ("WholeSaleOrder", "WholeSaleOrder"),
+    ]
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="document_sequences")
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPE_CHOICES)
+    year = models.PositiveIntegerField()
+    is_taxable = models.BooleanField(default=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'document_type', 'year', 'is_taxable'], name='unique_document_sequence')
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.document_type} {self.year} > {self.last_value}"
+
+    @classmethod
+    def next_value(cls, organization_id, document_type, year, is_taxable):
+        """
+        Hand out the next number of a sequence with a single upsert.
+        The sequence row stays locked until the surrounding transaction ends,
+        so concurrent creates queue up instead of drawing the same number.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (organization_id, document_type, year, is_taxable, last_value) "
+                f"VALUES (%s, %s, %s, %s, 1) "
+                f"ON CONFLICT (organization_id, document_type, year, is_taxable) "
+                f"DO UPDATE SET last_value = {table}.last_value + 1 "
+                f"RETURNING last_value",
+                [organization_id, document_type, year, is_taxable]
+            )
+            return cursor.fetchone()[0]
+
+
+class IdempotencyKey(models.Model):
+    """ Response of a POST sent with an Idempotency-Key header, replayed when the request is retried. """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_path = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    expires_on = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'key'], name='unique_idempotency_key')
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.key} > {self.response_status}"
+
+    @classmethod
+    def sweep(cls):
+        """ Delete expired keys, returning how many were removed. """
+        deleted, _ = cls.objects.filter(expires_on__lte=timezone.now()).delete()
+        return deleted
+
+
+class DailyOrgMetrics(models.Model):
+    """
+    One organization's activity on one day (by created_on), kept up to date by
+    organizations.metrics so reports aggregate days instead of raw rows.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="daily_metrics")
+    date = models.DateField()
+    invoice_count = models.PositiveIntegerField(default=0)
+    # Sum of invoice totals, i.e. after discount and including tax
+    invoice_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Active invoice payments (advances included) by payment mode
+    cash_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    card_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    online_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    other_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_customers = models.PositiveIntegerField(default=0)
+    new_prescriptions = models.PositiveIntegerField(default=0)
+    new_inventory = models.PositiveIntegerField(default=0)
+    inventory_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'date'], name='unique_daily_org_metrics')
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.date} > {self.invoice_count} invoices"
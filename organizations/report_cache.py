@@ -0,0 +1,105 @@
+import datetime
+import logging
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from optic_invoicer_api.shared_cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+def get_report_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def report_cache_enabled(cache):
+    """
+    Reports are cached in a cache shared by all processes, or in per-process memory when
+    REPORT_CACHE_PROCESS_LOCAL allows it: a version bumped in one process's memory would
+    leave the others serving the old report.
+    """
+    return is_shared_cache(cache) or settings.REPORT_CACHE_PROCESS_LOCAL
+
+
+def data_version_key(organization_id):
+    return f"org_data_version:{organization_id}"
+
+
+def get_data_version(organization_id):
+    """
+    Current version of the organization's report data. A missing counter restarts from the
+    clock, so it never comes back to a number that older cache entries were stored under.
+    """
+    cache = get_report_cache()
+    key = data_version_key(organization_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(organization_id):
+    cache = get_report_cache()
+    if not report_cache_enabled(cache):
+        return
+    key = data_version_key(organization_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.error('Report cache version bump failed for organization %s: %s', organization_id, e)
+
+
+def bump_data_version_on_commit(organization_id):
+    if organization_id:
+        transaction.on_commit(lambda: bump_data_version(organization_id))
+
+
+def normalize_date(value):
+    if value is None:
+        return "all"
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    try:
+        parsed_date = parse_date(value)
+    except ValueError:
+        parsed_date = None
+    return parsed_date.isoformat() if parsed_date else value
+
+
+def report_cache_key(organization_id, kind, start_date=None, end_date=None):
+    """
+    Key of a cached report, or None when the cache is unavailable or disabled. Take it before
+    building the report so data written meanwhile retires the entry.
+    """
+    if not report_cache_enabled(get_report_cache()):
+        return None
+    try:
+        version = get_data_version(organization_id)
+    except Exception as e:
+        logger.error('Report cache version read failed for organization %s: %s', organization_id, e)
+        return None
+    return f"report:{organization_id}:{kind}:{normalize_date(start_date)}:{normalize_date(end_date)}:{version}"
+
+
+def get_cached_report(key):
+    if key is None:
+        return None
+    try:
+        return get_report_cache().get(key)
+    except Exception as e:
+        logger.error('Report cache read failed for %s: %s', key, e)
+        return None
+
+
+def set_cached_report(key, data):
+    if key is None:
+        return
+    try:
+        get_report_cache().set(key, data, settings.REPORT_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.error('Report cache write failed for %s: %s', key, e)
@@ -163,24 +163,24 @@ class ListOrganizationSubscriptionSerializer(serializers.ModelSerializer):
         return ListOrganizationPaymentSerializer(latest_payment).data if latest_payment else None
 
 class ListOrganizationStaffSerializer(serializers.ModelSerializer):
-    superstaff_first_name = serializers.SerializerMethodField()
-    staff_count = serializers.SerializerMethodField()
+    """ Reads the annotations of OrganizationListView's queryset, so listing runs no per-organization queries. """
+    superstaff_first_name = serializers.CharField(read_only=True)
+    staff_count = serializers.IntegerField(read_only=True)
     subscription_status = serializers.SerializerMethodField()
 
     class Meta:
         model = Organization
-        fields = ['name','is_active','email','primary_phone_mobile' ,'staff_count', 'superstaff_first_name', 'subscription_status']
-
-    def get_superstaff_first_name(self, obj):
-        superstaff = Staff.objects.filter(organization=obj, staff_superuser=True).first()
-        return superstaff.first_name if superstaff else None
-
-    def get_staff_count(self, obj):
-        return Staff.objects.filter(organization=obj).count()
+        fields = ['name', 'is_active', 'email', 'primary_phone_mobile', 'staff_count', 'superstaff_first_name', 'subscription_status']
 
     def get_subscription_status(self, obj):
-        subscription = Subscription.objects.filter(organization=obj).first()
-        return ListOrganizationSubscriptionSerializer(subscription).data if subscription else None
+        if obj.latest_subscription_id is None:
+            return None
+        latest_payment = None
+        if obj.latest_payment_created_on is not None:
+            latest_payment = ListOrganizationPaymentSerializer(
+                Payment(amount=obj.latest_payment_amount, created_on=obj.latest_payment_created_on)
+            ).data
+        return {'status': obj.latest_subscription_status, 'latest_payment': latest_payment}
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
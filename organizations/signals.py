@@ -0,0 +1,44 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from customers.models import Customer, Prescription
+from inventory.models import Inventory
+from invoices.models import Invoice, InvoicePayment
+from .models import Organization, Subscription
+from .metrics import SOURCE_BY_MODEL, schedule_daily_metrics_refresh
+from .report_cache import bump_data_version_on_commit
+from .entitlements import invalidate_invoice_entitlement_on_commit
+
+
+@receiver([post_save, post_delete], sender=Invoice)
+@receiver([post_save, post_delete], sender=InvoicePayment)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Prescription)
+@receiver([post_save, post_delete], sender=Inventory)
+def metrics_source_changed(sender, instance, **kwargs):
+    schedule_daily_metrics_refresh(instance.organization_id, instance.created_on, SOURCE_BY_MODEL[sender])
+    # Retire cached reports as soon as the write commits; the rollup refresh bumps again once it is done
+    bump_data_version_on_commit(instance.organization_id)
+
+
+@receiver(post_save, sender=Organization)
+def organization_changed(sender, instance, **kwargs):
+    bump_data_version_on_commit(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    invalidate_invoice_entitlement_on_commit(instance.organization_id)
+
+
+@receiver(m2m_changed, sender=Subscription.payments.through)
+def subscription_payments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        organization_ids = {instance.organization_id}
+    else:
+        # Attached from the payment side: instance is the Payment
+        subscriptions = instance.subscription_payments.all() if action == 'pre_clear' else Subscription.objects.filter(pk__in=pk_set)
+        organization_ids = set(subscriptions.values_list('organization_id', flat=True))
+    for organization_id in organization_ids:
+        invalidate_invoice_entitlement_on_commit(organization_id)
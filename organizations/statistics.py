@@ -0,0 +1,139 @@
+import datetime
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+from customers.models import Customer, Prescription
+from inventory.models import Inventory
+from invoices.models import Invoice
+from .models import DailyOrgMetrics, Organization
+from .metrics import REPORT_METRICS, monthly_statistics
+from .report_cache import bump_data_version_on_commit
+
+# Organization statistics field -> (report model, organization total field)
+ORGANIZATION_STATISTICS = {
+    'invoice_statistics': (Invoice, 'total_invoices'),
+    'inventory_statistics': (Inventory, 'total_inventory'),
+    'customer_statistics': (Customer, 'total_customers'),
+    'prescription_statistics': (Prescription, 'total_prescriptions'),
+}
+# The current month and the ones before it kept in the statistics
+STATISTICS_MONTHS = 5
+# Rollup rows written this close to a run are looked at again by the next one,
+# so a row committed while the run reads cannot be skipped
+STATISTICS_SETTLE_SECONDS = 60
+
+
+def month_start(year, month):
+    return datetime.date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def statistics_window_start(today):
+    """ First day of the oldest month kept in the organization statistics. """
+    return month_start(today.year, today.month - (STATISTICS_MONTHS - 1))
+
+
+def refresh_bounds():
+    """ Window start and the refresh time recorded by a refresh starting now. """
+    return (
+        statistics_window_start(timezone.localdate()),
+        timezone.now() - datetime.timedelta(seconds=STATISTICS_SETTLE_SECONDS),
+    )
+
+
+def refresh_organization_statistics(batch_size=100):
+    """
+    Bring the statistics stored on every active organization up to date, a batch at a time.
+    Returns the number of organizations written.
+    """
+    window_start, refreshed_on = refresh_bounds()
+    organizations = Organization.objects.filter(is_active=True).only(
+        'id', 'statistics_refreshed_on',
+        *ORGANIZATION_STATISTICS, *(total_field for _, total_field in ORGANIZATION_STATISTICS.values())
+    ).order_by('id')
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(organizations.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return updated
+        last_id = batch[-1].id
+        updated += refresh_statistics_batch(batch, window_start, refreshed_on)
+
+
+def refresh_statistics_batch(organizations, window_start, refreshed_on):
+    """
+    Recompute only the months with rollup rows written since each organization's last refresh,
+    drop months that left the window and write the changed organizations with one bulk_update.
+    """
+    organizations = {organization.id: organization for organization in organizations}
+    touched_rows = DailyOrgMetrics.objects.filter(organization_id__in=organizations).filter(
+        Q(organization__statistics_refreshed_on__isnull=True)
+        | Q(updated_on__gt=F('organization__statistics_refreshed_on'))
+    )
+    touched_months = {}
+    for organization_id, year, month in touched_rows.annotate(
+        year=ExtractYear('date'), month=ExtractMonth('date')
+    ).values_list('organization_id', 'year', 'month').distinct():
+        touched_months.setdefault(organization_id, set()).add((year, month))
+
+    count_fields = [count_field for count_field, _ in REPORT_METRICS.values()]
+    fields = count_fields + [value_field for _, value_field in REPORT_METRICS.values() if value_field]
+    recomputed_rows = {}
+    totals = {}
+    if touched_months:
+        months_in_window = Q(pk__in=[])
+        for organization_id, months in touched_months.items():
+            for year, month in months:
+                if month_start(year, month) >= window_start:
+                    months_in_window |= Q(
+                        organization_id=organization_id,
+                        date__gte=month_start(year, month),
+                        date__lt=month_start(year, month + 1),
+                    )
+        for row in DailyOrgMetrics.objects.filter(months_in_window).annotate(
+            year=ExtractYear('date'), month=ExtractMonth('date')
+        ).values('organization_id', 'year', 'month').annotate(
+            **{field: Sum(field) for field in fields}
+        ).order_by('organization_id', 'year', 'month'):
+            recomputed_rows.setdefault(row.pop('organization_id'), []).append(row)
+        for row in DailyOrgMetrics.objects.filter(organization_id__in=touched_months).values('organization_id').annotate(
+            **{field: Sum(field) for field in count_fields}
+        ).order_by():
+            totals[row.pop('organization_id')] = row
+
+    window = (window_start.year, window_start.month)
+    changed = []
+    for organization_id, organization in organizations.items():
+        months = touched_months.get(organization_id, set())
+        # A first refresh is always recorded, even with nothing to compute, so it is not redone on every read
+        is_changed = bool(months) or organization.statistics_refreshed_on is None
+        for statistics_field, (model, total_field) in ORGANIZATION_STATISTICS.items():
+            stored = getattr(organization, statistics_field) or []
+            kept = [
+                stat for stat in stored
+                if (stat['year'], stat['month']) >= window and (stat['year'], stat['month']) not in months
+            ]
+            if len(kept) == len(stored) and not months:
+                continue
+            is_changed = True
+            fresh = monthly_statistics(recomputed_rows.get(organization_id, []), *REPORT_METRICS[model])
+            setattr(organization, statistics_field, sorted(kept + fresh, key=lambda stat: (stat['year'], stat['month'])))
+            if organization_id in totals:
+                setattr(organization, total_field, totals[organization_id][REPORT_METRICS[model][0]])
+        if is_changed:
+            organization.statistics_refreshed_on = refreshed_on
+            changed.append(organization)
+
+    if changed:
+        with transaction.atomic():
+            Organization.objects.bulk_update(
+                changed,
+                ['statistics_refreshed_on', *ORGANIZATION_STATISTICS,
+                 *(total_field for _, total_field in ORGANIZATION_STATISTICS.values())],
+            )
+            # bulk_update sends no post_save, so cached organization responses are retired here
+            for organization in changed:
+                bump_data_version_on_commit(organization.id)
+    return len(changed)
@@ -0,0 +1,28 @@
+from celery import shared_task
+import logging
+from django.utils.dateparse import parse_date
+from .models import IdempotencyKey
+
+
+@shared_task
+def sweep_idempotency_keys():
+    deleted = IdempotencyKey.sweep()
+    logging.info(f"Swept {deleted} expired idempotency keys")
+    return deleted
+
+
+@shared_task
+def refresh_organization_statistics(batch_size=100):
+    from .statistics import refresh_organization_statistics as refresh
+    updated = refresh(batch_size)
+    logging.info(f"Refreshed statistics of {updated} organizations")
+    return updated
+
+
+@shared_task
+def refresh_daily_metrics(days):
+    """ Refresh the [organization id, YYYY-MM-DD, sources] days queued by organizations.metrics. """
+    from .metrics import refresh_organization_days
+    refresh_organization_days({
+        (organization_id, parse_date(day)): set(sources) for organization_id, day, sources in days
+    })
@@ -1,3 +1,89 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from customers.models import Customer
+from invoices.models import Invoice, InvoicePayment
+from staff.models import Staff
+from .models import Organization
+from .utils import compute_reports
 
-# Create your tests here.
+LOCAL_MEMORY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'organizations-report-cache-tests',
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_MEMORY_CACHES, REPORT_CACHE_ALIAS='default', REPORT_CACHE_PROCESS_LOCAL=True)
+class ReportCacheTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create(username='owner')
+        self.organization = Organization.objects.create(
+            name='Optix', owner=self.user, address_first_line='Street 1', email='optix@example.com',
+            primary_phone_mobile='12345', country='India', city='Pune'
+        )
+        Staff.objects.create(
+            first_name='Asha', last_name='Rao', designation='Manager', phone='12345', email='asha@example.com',
+            user=self.user, organization=self.organization, staff_superuser=True
+        )
+        self.customer = self.write(lambda: Customer.objects.create(
+            first_name='Ravi', last_name='Kumar', phone='55555', organization=self.organization
+        ))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_report(self):
+        """ Load the dashboard report, returning it and whether it had to be built. """
+        with mock.patch('organizations.api.compute_reports', side_effect=compute_reports) as build:
+            response = self.client.get('/api/report_organization', {'date_request_string': 'this_month'})
+        self.assertEqual(response.status_code, 200)
+        return response.data, build.called
+
+    def write(self, create):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create()
+
+    def test_repeat_load_hits_the_cache(self):
+        report, built = self.get_report()
+        self.assertTrue(built)
+        cached_report, built = self.get_report()
+        self.assertFalse(built)
+        self.assertEqual(cached_report, report)
+
+    def test_invoice_write_retires_the_report(self):
+        report, _ = self.get_report()
+        self.write(lambda: Invoice.objects.create(
+            customer=self.customer, organization=self.organization, total=100, advance=0
+        ))
+        new_report, built = self.get_report()
+        self.assertTrue(built)
+        self.assertEqual(new_report['total_invoices'], report['total_invoices'] + 1)
+
+    def test_customer_write_retires_the_report(self):
+        report, _ = self.get_report()
+        self.write(lambda: Customer.objects.create(
+            first_name='Meera', last_name='Iyer', phone='66666', organization=self.organization
+        ))
+        new_report, built = self.get_report()
+        self.assertTrue(built)
+        self.assertEqual(new_report['total_customers'], report['total_customers'] + 1)
+
+    def test_payment_write_retires_the_report(self):
+        invoice = self.write(lambda: Invoice.objects.create(
+            customer=self.customer, organization=self.organization, total=100, balance=100, advance=0
+        ))
+        self.get_report()
+        self.write(lambda: InvoicePayment.objects.create(invoice=invoice, amount=40, organization=self.organization))
+        _, built = self.get_report()
+        self.assertTrue(built)
+
+    @override_settings(REPORT_CACHE_PROCESS_LOCAL=False)
+    def test_process_local_cache_is_not_used_by_default(self):
+        self.get_report()
+        _, built = self.get_report()
+        self.assertTrue(built)
@@ -11,6 +11,7 @@ import random
 import string
 from django.db.models import Count, Sum
 from django.db.models.functions import ExtractYear, ExtractMonth
+from .metrics import REPORT_METRICS, report_metrics, monthly_statistics
 
 
 def generate_random_password(length):
@@ -55,25 +56,21 @@ def compute_reports(organization, start_date=None, end_date=None, get_all=False)
     end_date = end_date or datetime.date.today()
     start_date = start_date or end_date - datetime.timedelta(days=5 * 30)
 
-    invoice_stats = compute_statistics(Invoice, organization, start_date, end_date, get_all)
-    inventory_stats = compute_statistics(Inventory, organization, start_date, end_date, get_all)
-    customer_stats = compute_statistics(Customer, organization, start_date, end_date, get_all)
-    prescription_stats = compute_statistics(Prescription, organization, start_date, end_date, get_all)
-
-    # Convert stats to required format
-    invoice_statistics = [{'year': stat['year'], 'month': stat['month'], 'count': stat['count'], 'value': float(stat['value'])} for stat in invoice_stats]
-    inventory_statistics = [{'year': stat['year'], 'month': stat['month'], 'count': stat['count'], 'value': float(stat['value'])} for stat in inventory_stats]
-    customer_statistics = [{'year': stat['year'], 'month': stat['month'], 'count': stat['count']} for stat in customer_stats]
-    prescription_statistics = [{'year': stat['year'], 'month': stat['month'], 'count': stat['count']} for stat in prescription_stats]
+    # Monthly figures and totals of every model come from the daily rollup in one query
+    monthly_rows, totals = report_metrics(organization, None if get_all else start_date, None if get_all else end_date)
+    invoice_statistics = monthly_statistics(monthly_rows, *REPORT_METRICS[Invoice])
+    inventory_statistics = monthly_statistics(monthly_rows, *REPORT_METRICS[Inventory])
+    customer_statistics = monthly_statistics(monthly_rows, *REPORT_METRICS[Customer])
+    prescription_statistics = monthly_statistics(monthly_rows, *REPORT_METRICS[Prescription])
 
     report_data = {
-        "total_inventory": Inventory.objects.filter(organization=organization.id).count(),
+        "total_inventory": totals[REPORT_METRICS[Inventory][0]],
         "inventory_statistics": inventory_statistics,
-        "total_invoices": Invoice.objects.filter(organization=organization.id).count(),
+        "total_invoices": totals[REPORT_METRICS[Invoice][0]],
         "invoice_statistics": invoice_statistics,
-        "total_customers": Customer.objects.filter(organization=organization.id).count(),
+        "total_customers": totals[REPORT_METRICS[Customer][0]],
         "customer_statistics": customer_statistics,
-        "total_prescriptions": Prescription.objects.filter(organization=organization.id).count(),
+        "total_prescriptions": totals[REPORT_METRICS[Prescription][0]],
         "prescription_statistics": prescription_statistics,
     }
 
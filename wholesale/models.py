@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from datetime import datetime
+from organizations.models import DocumentSequence
 from .choices import PAYMENT_STATUS_CHOICES, ORDER_STATUS_CHOICES
 
 # Create your models here.
@@ -129,11 +130,8 @@ class WholeSaleOrder(models.Model):
         # Get the current year
         year = datetime.now().year
 
-        # Get the count of invoices for the current year and organization
-        count = WholeSaleOrder.objects.filter(
-            organization=self.organization,
-            created_on__year=year
-        ).count() + 1  # Add 1 for the current invoice
+        # Draw the next number from the organization's wholesale order sequence for the year
+        count = DocumentSequence.next_value(self.organization_id, "WholeSaleOrder", year, self.is_taxable)
         # Return the formatted WholeSale Order number
         if self.is_taxable:
             return f"WSO{prefix}{year}{count:05}"